@@ -7,6 +7,8 @@ import time
 from datetime import datetime
 from openai import OpenAI
 
+from file_utils import write_file_atomic
+
 class BetaReader:
     def __init__(self, openai_client):
         self.client = openai_client
@@ -16,18 +18,16 @@ class BetaReader:
         if session_id not in responses_state:
             return ""
         
-        session_text = ""
         session_data = responses_state[session_id]
         
-        if "questions" in session_data:
-            for question, answer_data in session_data["questions"].items():
-                session_text += f"Q: {question}\nA: {answer_data['answer']}\n\n"
-        
-        return session_text
+        return "".join(
+            f"Q: {question}\nA: {answer_data['answer']}\n\n"
+            for question, answer_data in session_data.get("questions", {}).items()
+        )
     
     def generate_feedback(self, session_title, session_text, feedback_type="comprehensive", profile_sections=None):
         """Generate beta reader/editor feedback for a completed session"""
-        if not session_text.strip():
+        if not session_text or session_text.isspace():
             return {"error": "Session has no content to analyze"}
         
         critique_templates = {
@@ -95,9 +95,10 @@ Focus on:
             
             # Add a summary of what profile information was used
             summary = ""
-            if profile_sections:
+            unique_sections = list(dict.fromkeys(profile_sections)) if profile_sections else []
+            if unique_sections:
                 summary = "\n\n---\n📋 **PROFILE INFORMATION ACCESSED BY BETA READER:**\n"
-                for section in set(profile_sections):
+                for section in unique_sections:
                     summary += f"• {section}\n"
                 summary += "\n*Look for [PROFILE: section_name] markers in the feedback above to see where this information influenced the analysis.*\n"
             
@@ -106,7 +107,7 @@ Focus on:
                 "feedback": feedback + summary,
                 "generated_at": datetime.now().isoformat(),
                 "feedback_type": feedback_type,
-                "profile_sections_used": list(set(profile_sections)) if profile_sections else []
+                "profile_sections_used": unique_sections
             }
             
         except Exception as e:
@@ -127,8 +128,7 @@ Focus on:
             
             user_data["beta_feedback"][str(session_id)] = feedback_data
             
-            with open(filename, 'w') as f:
-                json.dump(user_data, f, indent=2)
+            write_file_atomic(filename, json.dumps(user_data, separators=(",", ":")))
             
             return True
         except Exception as e:
@@ -145,7 +145,7 @@ Focus on:
                 
                 if "beta_feedback" in user_data and str(session_id) in user_data["beta_feedback"]:
                     return user_data["beta_feedback"][str(session_id)]
-        except:
+        except (OSError, ValueError, TypeError):
             pass
         return None
     
@@ -163,7 +163,7 @@ Focus on:
         try:
             generated_date = datetime.fromisoformat(feedback['generated_at']).strftime('%B %d, %Y at %I:%M %p')
             st.caption(f"Generated: {generated_date}")
-        except:
+        except (KeyError, TypeError, ValueError):
             st.caption("Generated: Recently")
         
         # Show what profile information was used
@@ -182,14 +182,11 @@ Focus on:
         feedback_text = feedback["feedback"]
         
         # Split into sections and highlight profile markers
-        parts = re.split(r'(\[PROFILE:.*?\])', feedback_text)
-        formatted_feedback = ""
-        for i, part in enumerate(parts):
-            if part.startswith('[PROFILE:') and part.endswith(']'):
-                # This is a profile marker - make it stand out
-                formatted_feedback += f'<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 4px; border-radius: 4px;">{part}</span>'
-            else:
-                formatted_feedback += part
+        formatted_feedback = re.sub(
+            r'\[PROFILE:.*?\]',
+            lambda m: f'<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 4px; border-radius: 4px;">{m.group()}</span>',
+            feedback_text
+        )
         
         st.markdown(formatted_feedback, unsafe_allow_html=True)
         
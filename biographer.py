@@ -14,6 +14,7 @@ import string
 import time
 import shutil
 import base64
+import PIL
 from PIL import Image
 import io
 import zipfile
@@ -23,9 +24,16 @@ import tempfile
 import csv
 import uuid
 import logging
+from operator import attrgetter, itemgetter
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
 import pickle  # Added for session persistence
 
+from file_utils import write_file_atomic
+from image_utils import ENCODE_POOL, save_jpeg, load_image_metadata, user_image_dir
+from text_utils import TAG_RE, count_words, count_word_tokens, clean_text_for_export, html_preview, format_feedback_date
+
 # ============================================================================
 # PRODUCTION CONFIGURATION - MUST BE FIRST
 # ============================================================================
@@ -54,6 +62,7 @@ logger = logging.getLogger(__name__)
 # ============================================================================
 SESSION_DIR = "persistent_sessions"
 AUTO_BACKUP_DIR = "auto_backups"
+AUTO_BACKUP_INTERVAL = 300  # seconds between auto-backups of the same user
 
 def save_session_to_disk(user_id):
     """Save user session to disk for persistence across server restarts"""
@@ -69,8 +78,7 @@ def save_session_to_disk(user_id):
             "app_version": st.session_state.get("app_version", "2.0.0")
         }
         session_file = Path(SESSION_DIR) / f"{user_id}.session"
-        with open(session_file, 'w') as f:
-            json.dump(session_data, f, indent=2)
+        write_file_atomic(session_file, json.dumps(session_data, separators=(",", ":")))
         logger.info(f"Session saved to disk for user {user_id}")
         return True
     except Exception as e:
@@ -144,26 +152,37 @@ def recover_persistent_session():
     return False
 
 def auto_backup_user_data():
-    """Create automatic backup of user data"""
-    if not st.session_state.get('user_id'):
+    """Create automatic backup of user data, at most once per AUTO_BACKUP_INTERVAL.
+
+    Saves come in bursts while someone is writing; snapshotting every one of
+    them rewrote the whole account and rotated the ten kept backups through
+    a few minutes of typing, so saves in between are folded into the next one.
+    """
+    user_id = st.session_state.get('user_id')
+    if not user_id:
+        return
+    
+    last_backups = st.session_state.setdefault("_last_auto_backup", {})
+    now_ts = time.monotonic()
+    if now_ts - last_backups.get(user_id, float("-inf")) < AUTO_BACKUP_INTERVAL:
         return
     
     try:
         backup_dir = Path(AUTO_BACKUP_DIR)
         backup_dir.mkdir(parents=True, exist_ok=True)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         backup_data = {
             "user_id": st.session_state.user_id,
             "user_account": st.session_state.user_account,
             "responses": st.session_state.responses,
-            "backup_date": datetime.now().isoformat(),
+            "backup_date": now.isoformat(),
             "version": st.session_state.get("app_version", "2.0.0")
         }
         
         backup_file = backup_dir / f"{st.session_state.user_id}_{timestamp}.json"
-        with open(backup_file, 'w') as f:
-            json.dump(backup_data, f, indent=2)
+        backup_file.write_text(json.dumps(backup_data, separators=(",", ":")))
         
         # Keep only last 10 backups per user
         user_backups = sorted([
@@ -175,6 +194,7 @@ def auto_backup_user_data():
             oldest.unlink()
             logger.info(f"Removed old backup: {oldest}")
             
+        last_backups[user_id] = now_ts
         logger.info(f"Auto-backup created: {backup_file}")
             
     except Exception as e:
@@ -220,6 +240,7 @@ validate_environment()
 PUBLISHER_AVAILABLE = True
 QUILL_AVAILABLE = False
 EPUB_AVAILABLE = False
+ORJSON_AVAILABLE = False
 
 try:
     from streamlit_quill import st_quill
@@ -237,6 +258,48 @@ try:
 except ImportError:
     logger.warning("EbookLib not available - EPUB export disabled")
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    logger.info("orjson loaded successfully")
+except ImportError:
+    logger.info("orjson not available - using stdlib json")
+
+# pillow-simd keeps the PIL package name and marks its releases with a
+# ".postN" suffix; see requirements.txt for how to install it
+PILLOW_SIMD = ".post" in PIL.__version__
+if PILLOW_SIMD:
+    logger.info(f"Pillow-SIMD {PIL.__version__} loaded - SIMD image resizing enabled")
+else:
+    logger.info(f"Stock Pillow {PIL.__version__} loaded - install pillow-simd for faster resizing")
+
+# Largest user-uploaded JSON (backup or transcript) we will parse; a personal
+# backup is text only, so anything bigger is not one of ours
+MAX_JSON_UPLOAD_BYTES = 8 * 1024 * 1024
+
+def json_loads(data):
+    """Parse uploaded JSON (str or raw bytes), using orjson when it is installed.
+
+    orjson reads UTF-8 bytes directly and its decode error subclasses
+    ValueError, so callers keep a single ``except ValueError``.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_json_file(path):
+    """Read and parse a JSON file from disk as raw bytes via json_loads()."""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def dump_json_file(path, data):
+    """Atomically write data as compact JSON, serialised by orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        payload = orjson.dumps(data)
+    else:
+        payload = json.dumps(data, separators=(",", ":")).encode()
+    write_file_atomic(path, payload)
+
 try:
     from topic_bank import TopicBank
     from session_manager import SessionManager
@@ -336,13 +399,21 @@ for key, value in default_state.items():
     if key not in st.session_state:
         st.session_state[key] = value
 
-# Load external CSS with error handling
+@st.cache_resource(show_spinner=False)
+def load_stylesheet(path, mtime):
+    """Read and wrap a stylesheet once per file version (mtime is the cache key)."""
+    with open(path, encoding="utf-8") as f:
+        css = f"<style>{f.read()}</style>"
+    logger.info("CSS loaded successfully")
+    return css
+
+# Load external CSS with error handling. The <style> block still has to be
+# emitted on every rerun (Streamlit drops elements not re-sent), but the file
+# is only read again when it changes.
 try:
     css_path = Path("styles.css")
     if css_path.exists():
-        with open(css_path, encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-        logger.info("CSS loaded successfully")
+        st.markdown(load_stylesheet(str(css_path), css_path.stat().st_mtime), unsafe_allow_html=True)
     else:
         logger.warning("styles.css not found")
 except Exception as e:
@@ -373,7 +444,11 @@ if not st.session_state.get('logged_in', False):
 # GAMIFICATION SYSTEM - STREAKS & MILESTONES
 # ============================================================================
 def update_writing_streak(user_id):
-    """Update the user's writing streak based on today's activity"""
+    """Update the user's writing streak based on today's activity.
+
+    Only the in-memory account is changed; the caller saves it once together
+    with its own edits.
+    """
     if not user_id or not st.session_state.user_account:
         return
     
@@ -400,16 +475,7 @@ def update_writing_streak(user_id):
         last_date = streak_data.get('last_write_date')
         
         # Calculate today's word count (from all sessions)
-        today_words = 0
-        for session in st.session_state.current_question_bank or []:
-            sid = session["id"]
-            if sid in st.session_state.responses:
-                for q_data in st.session_state.responses[sid].get("questions", {}).values():
-                    if q_data.get("answer"):
-                        timestamp = q_data.get("timestamp", "")
-                        if timestamp and timestamp.startswith(today_str):
-                            text_only = re.sub(r'<[^>]+>', '', q_data["answer"])
-                            today_words += len(re.findall(r'\w+', text_only))
+        today_words = get_todays_word_count(today_str)
         
         # Only count if at least 50 words written today
         if today_words >= 50:
@@ -436,7 +502,6 @@ def update_writing_streak(user_id):
             # Check milestones
             check_milestones(user_id, streak_data)
             
-            save_account_data(st.session_state.user_account)
             logger.info(f"Streak updated for user {user_id}: {streak_data['current_streak']} days")
     except Exception as e:
         logger.error(f"Error updating streak: {e}")
@@ -473,33 +538,30 @@ def check_milestones(user_id, streak_data):
         if not milestones.get('first_session_complete'):
             for session in st.session_state.current_question_bank or []:
                 sid = session["id"]
-                if sid in st.session_state.responses:
-                    answered = len(st.session_state.responses[sid].get("questions", {}))
-                    total = len(session["questions"])
-                    if answered >= total and total > 0:
-                        milestones['first_session_complete'] = True
-                        st.session_state[f"milestone_achieved_first_session"] = True
-                        logger.info(f"User {user_id} completed first session")
-                        break
+                answered = len(st.session_state.responses[sid]["questions"])
+                total = len(session["questions"])
+                if answered >= total and total > 0:
+                    milestones['first_session_complete'] = True
+                    st.session_state[f"milestone_achieved_first_session"] = True
+                    logger.info(f"User {user_id} completed first session")
+                    break
         
         streak_data['milestones'] = milestones
     except Exception as e:
         logger.error(f"Error checking milestones: {e}")
 
-def get_todays_word_count():
-    """Get total words written today across all sessions"""
+def get_todays_word_count(today=None):
+    """Get total words written today (or on the ISO date `today`) across all sessions"""
     try:
-        today = datetime.now().date().isoformat()
+        today = today or datetime.now().date().isoformat()
         total = 0
         
         for session in st.session_state.current_question_bank or []:
             sid = session["id"]
-            if sid in st.session_state.responses:
-                for q_data in st.session_state.responses[sid].get("questions", {}).values():
-                    timestamp = q_data.get("timestamp", "")
-                    if timestamp and timestamp.startswith(today):
-                        text_only = re.sub(r'<[^>]+>', '', q_data.get("answer", ""))
-                        total += len(re.findall(r'\w+', text_only))
+            for q_data in st.session_state.responses[sid]["questions"].values():
+                timestamp = q_data.get("timestamp", "")
+                if timestamp and timestamp.startswith(today):
+                    total += count_word_tokens(TAG_RE.sub('', q_data.get("answer", "")))
         
         return total
     except Exception as e:
@@ -508,10 +570,57 @@ def get_todays_word_count():
 
 def get_daily_goal():
     """Get daily word goal from user settings or default"""
-    try:
-        return st.session_state.user_account.get('settings', {}).get('daily_word_goal', 500)
-    except:
-        return 500
+    account = st.session_state.get('user_account') or {}
+    return account.get('settings', {}).get('daily_word_goal', 500)
+
+_STREAK_CSS = """
+    <style>
+    .streak-box {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        padding: 20px;
+        border-radius: 10px;
+        color: white;
+        text-align: center;
+        margin-bottom: 20px;
+    }
+    .streak-number {
+        font-size: 48px;
+        font-weight: bold;
+        line-height: 1;
+    }
+    .streak-label {
+        font-size: 14px;
+        opacity: 0.9;
+    }
+    .progress-container {
+        background: rgba(255,255,255,0.2);
+        border-radius: 10px;
+        height: 10px;
+        margin: 10px 0;
+    }
+    .progress-fill {
+        background: white;
+        border-radius: 10px;
+        height: 10px;
+        transition: width 0.3s ease;
+    }
+    .milestone-item {
+        display: flex;
+        align-items: center;
+        padding: 8px;
+        background: rgba(255,255,255,0.1);
+        border-radius: 5px;
+        margin-bottom: 5px;
+    }
+    .milestone-check {
+        margin-right: 10px;
+        font-size: 18px;
+    }
+    .milestone-text {
+        font-size: 14px;
+    }
+    </style>
+"""
 
 def render_gamification_dashboard():
     """Render the gamification dashboard in the sidebar"""
@@ -531,54 +640,7 @@ def render_gamification_dashboard():
         
         fire_emoji = "🔥" * min(5, max(1, (current_streak // 7) + 1)) if current_streak > 0 else "🌱"
         
-        st.markdown("""
-        <style>
-        .streak-box {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            padding: 20px;
-            border-radius: 10px;
-            color: white;
-            text-align: center;
-            margin-bottom: 20px;
-        }
-        .streak-number {
-            font-size: 48px;
-            font-weight: bold;
-            line-height: 1;
-        }
-        .streak-label {
-            font-size: 14px;
-            opacity: 0.9;
-        }
-        .progress-container {
-            background: rgba(255,255,255,0.2);
-            border-radius: 10px;
-            height: 10px;
-            margin: 10px 0;
-        }
-        .progress-fill {
-            background: white;
-            border-radius: 10px;
-            height: 10px;
-            transition: width 0.3s ease;
-        }
-        .milestone-item {
-            display: flex;
-            align-items: center;
-            padding: 8px;
-            background: rgba(255,255,255,0.1);
-            border-radius: 5px;
-            margin-bottom: 5px;
-        }
-        .milestone-check {
-            margin-right: 10px;
-            font-size: 18px;
-        }
-        .milestone-text {
-            font-size: 14px;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(_STREAK_CSS, unsafe_allow_html=True)
         
         st.markdown(f"""
         <div class="streak-box">
@@ -599,11 +661,8 @@ def render_gamification_dashboard():
         with col1:
             st.metric("Total Words", f"{total_words:,}")
         with col2:
-            sessions_completed = 0
-            if st.session_state.current_question_bank:
-                sessions_completed = sum(1 for s in st.session_state.current_question_bank 
-                                       if len(st.session_state.responses.get(s["id"], {}).get("questions", {})) >= len(s["questions"]))
-            st.metric("Sessions Done", f"{sessions_completed}/{len(st.session_state.current_question_bank) if st.session_state.current_question_bank else 0}")
+            sessions_completed = sum(1 for answered, total in SESSION_COUNTS.values() if answered >= total)
+            st.metric("Sessions Done", f"{sessions_completed}/{len(SESSION_COUNTS)}")
         
         st.divider()
         
@@ -659,27 +718,38 @@ def render_gamification_dashboard():
 # HISTORICAL EVENTS HELPER
 # ============================================================================
 def get_historical_events_for_prompt(birth_year=None):
-    """Read historical events from CSV and format them"""
+    """Historical events text for the prompt, re-read only when the CSV changes"""
+    try:
+        csv_mtime = Path("historical_events.csv").stat().st_mtime_ns
+    except FileNotFoundError:
+        return ""
+    except Exception as e:
+        logger.error(f"Could not load historical events: {e}")
+        return ""
+    return format_historical_events(birth_year, csv_mtime)
+
+@st.cache_data(show_spinner=False)
+def format_historical_events(birth_year, csv_mtime):
+    """Read historical events from CSV and format them; csv_mtime is only the cache key"""
     events_text = ""
     try:
         csv_path = Path("historical_events.csv")
         if csv_path.exists():
             with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                events = []
-                for row in reader:
+                def in_lifetime(row):
                     era = row.get('era_range', '')
-                    year_num = None
-                    if era and birth_year:
-                        years = re.findall(r'\d{4}', era)
-                        if years:
-                            year_num = int(years[0])
-                    
-                    if birth_year is None or year_num is None or year_num >= birth_year:
-                        events.append(row)
+                    if not (era and birth_year):
+                        return True
+                    year = re.search(r'\d{4}', era)
+                    return year is None or int(year.group()) >= birth_year
+                
+                # Only five events go into the prompt, so stop reading the CSV once they are found
+                events = list(islice(filter(in_lifetime, csv.DictReader(f)), 5))
                 
-                for event in events[:5]:
-                    events_text += f"• {event.get('era_range', '')}: {event.get('event', '')} - {event.get('description', '')[:100]}...\n"
+                events_text = "".join(
+                    f"• {event.get('era_range', '')}: {event.get('event', '')} - {event.get('description', '')[:100]}...\n"
+                    for event in events
+                )
             logger.info(f"Loaded {len(events)} historical events")
     except Exception as e:
         logger.error(f"Could not load historical events: {e}")
@@ -774,6 +844,22 @@ Keep the tone warm and supportive. Use the user's name if available in profile c
         logger.error(f"Error generating prompts: {e}")
         return {"error": str(e)}
 
+_PROMPT_BOX_CSS = """
+    <style>
+    .prompt-box {
+        background-color: #f8f9fa;
+        border-left: 4px solid #9b59b6;
+        padding: 20px;
+        border-radius: 8px;
+        margin: 20px 0;
+    }
+    .prompt-box h4 {
+        color: #8e44ad;
+        margin-top: 0;
+    }
+    </style>
+"""
+
 def show_prompt_me_modal():
     """Display the Prompt Me modal with writing prompts"""
     if not st.session_state.get('current_prompt_data'):
@@ -797,21 +883,7 @@ def show_prompt_me_modal():
     if prompt_data.get('error'):
         st.error(f"Could not generate prompts: {prompt_data['error']}")
     else:
-        st.markdown("""
-        <style>
-        .prompt-box {
-            background-color: #f8f9fa;
-            border-left: 4px solid #9b59b6;
-            padding: 20px;
-            border-radius: 8px;
-            margin: 20px 0;
-        }
-        .prompt-box h4 {
-            color: #8e44ad;
-            margin-top: 0;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(_PROMPT_BOX_CSS, unsafe_allow_html=True)
         
         st.markdown('<div class="prompt-box">', unsafe_allow_html=True)
         st.markdown(prompt_data['prompts'])
@@ -882,29 +954,45 @@ def create_backup():
         return None
     
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         backup_data = {
             "user_id": st.session_state.user_id,
             "user_account": st.session_state.user_account,
             "responses": st.session_state.responses,
-            "backup_date": datetime.now().isoformat(),
+            "backup_date": now.isoformat(),
             "version": st.session_state.get("app_version", "1.0")
         }
         
+        backup_json = json.dumps(backup_data, indent=2)
         backup_file = Path(f"backups/{st.session_state.user_id}_{timestamp}.json")
         with open(backup_file, 'w') as f:
-            json.dump(backup_data, f, indent=2)
+            f.write(backup_json)
         
         logger.info(f"Backup created: {backup_file}")
-        return json.dumps(backup_data, indent=2)
+        return backup_json
     except Exception as e:
         logger.error(f"Backup failed: {e}")
         st.error(f"Backup failed: {e}")
         return None
 
 def restore_from_backup(backup_json):
+    """Restore account and responses from backup JSON (str or raw UTF-8 bytes)."""
+    if len(backup_json) > MAX_JSON_UPLOAD_BYTES:
+        logger.error(f"Restore refused, backup is {len(backup_json)} bytes")
+        st.error("Restore failed: the file is too large to be a backup")
+        return False
+    try:
+        backup_data = json_loads(backup_json)
+    except ValueError as e:
+        logger.error(f"Restore failed, invalid backup JSON: {e}")
+        st.error("Restore failed: the file is not a valid backup")
+        return False
+    if not isinstance(backup_data, dict):
+        st.error("Restore failed: the file is not a valid backup")
+        return False
+    
     try:
-        backup_data = json.loads(backup_json)
         if backup_data.get("user_id") != st.session_state.user_id:
             logger.warning(f"Backup user mismatch: {backup_data.get('user_id')} vs {st.session_state.user_id}")
             st.error("Backup belongs to a different user")
@@ -912,6 +1000,8 @@ def restore_from_backup(backup_json):
         
         st.session_state.user_account = backup_data.get("user_account", st.session_state.user_account)
         st.session_state.responses = backup_data.get("responses", st.session_state.responses)
+        for sdata in st.session_state.responses.values():
+            sdata.setdefault("questions", {})
         save_account_data(st.session_state.user_account)
         save_user_data(st.session_state.user_id, st.session_state.responses)
         
@@ -932,20 +1022,19 @@ def list_backups():
         if backup_dir.exists():
             for f in backup_dir.glob(f"{st.session_state.user_id}_*.json"):
                 try:
-                    with open(f, 'r') as file:
-                        data = json.load(file)
-                        backups.append({
-                            "filename": f.name,
-                            "date": data.get("backup_date", "Unknown"),
-                            "size": f.stat().st_size
-                        })
+                    data = load_json_file(f)
+                    backups.append({
+                        "filename": f.name,
+                        "date": data.get("backup_date", "Unknown"),
+                        "size": f.stat().st_size
+                    })
                 except Exception as e:
                     logger.error(f"Error reading backup {f}: {e}")
                     continue
     except Exception as e:
         logger.error(f"Error listing backups: {e}")
     
-    return sorted(backups, key=lambda x: x["date"], reverse=True)
+    return sorted(backups, key=itemgetter("date"), reverse=True)
 
 # ============================================================================
 # IMAGE HANDLER WITH PRODUCTION SAFEGUARDS
@@ -961,42 +1050,45 @@ class ImageHandler:
             "dpi": 300,
             "quality": 85,
             "max_file_size_mb": 5,
+            "max_pixels": 50_000_000,
             "aspect_ratio": 1.6
         }
     
     def get_user_path(self):
         if self.user_id:
-            user_hash = hashlib.md5(self.user_id.encode()).hexdigest()[:8]
-            path = self.base_path / f"user_{user_hash}"
-            path.mkdir(parents=True, exist_ok=True)
-            (path / "thumbnails").mkdir(parents=True, exist_ok=True)
-            return path
+            return user_image_dir(self.base_path, self.user_id)
         return self.base_path
     
+    @staticmethod
+    def flatten_to_rgb(image):
+        """Composite transparent/palette images onto white; other modes pass through untouched."""
+        if image.mode in ('RGBA', 'LA', 'P'):
+            bg = Image.new('RGB', image.size, (255, 255, 255))
+            if image.mode == 'P':
+                image = image.convert('RGBA')
+            if image.mode == 'RGBA':
+                bg.paste(image, mask=image.split()[-1])
+            else:
+                bg.paste(image)
+            image = bg
+        return image
+    
     def optimize_image(self, image, max_width=1600, is_thumbnail=False):
         try:
-            if image.mode in ('RGBA', 'LA', 'P'):
-                bg = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                if image.mode == 'RGBA':
-                    bg.paste(image, mask=image.split()[-1])
-                else:
-                    bg.paste(image)
-                image = bg
+            image = self.flatten_to_rgb(image)
             
             width, height = image.size
             aspect = height / width
             
             if is_thumbnail:
-                size = min(width, height)
-                left = (width - size) // 2
-                top = (height - size) // 2
-                right = left + size
-                bottom = top + size
-                image = image.crop((left, top, right, bottom))
-                image.thumbnail((self.settings["thumbnail_size"], self.settings["thumbnail_size"]), Image.Resampling.LANCZOS)
-                return image
+                # Centre square crop and downscale in one resample (never upscaling);
+                # reducing_gap lets resize() box-reduce by an integer factor before LANCZOS
+                crop = min(width, height)
+                side = min(crop, self.settings["thumbnail_size"])
+                left = (width - crop) // 2
+                top = (height - crop) // 2
+                return image.resize((side, side), Image.Resampling.LANCZOS,
+                                    box=(left, top, left + crop, top + crop), reducing_gap=3.0)
             
             if width > max_width:
                 new_width = max_width
@@ -1016,26 +1108,40 @@ class ImageHandler:
             if original_size > self.settings["max_file_size_mb"]:
                 logger.warning(f"Large image ({original_size:.1f}MB). Will be optimized.")
             
+            # Image.open() only parses the header, so the format and size can be
+            # checked before committing to a full pixel decode
             img = Image.open(io.BytesIO(image_data))
+            if img.format not in ("JPEG", "PNG"):
+                logger.warning(f"Rejected upload with unsupported format {img.format}")
+                return None
+            if img.width * img.height > self.settings["max_pixels"]:
+                logger.warning(f"Rejected {img.width}x{img.height} upload, over the pixel limit")
+                return None
             target_width = self.settings["full_width"] if usage == "full_page" else self.settings["inline_width"]
+            if img.format == "JPEG":
+                # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying at least
+                # target_width wide, so LANCZOS starts from a far smaller bitmap
+                img.draft('RGB', (target_width, 1))
             
             image_id = hashlib.md5(f"{self.user_id}{session_id}{question_text}{datetime.now()}".encode()).hexdigest()[:16]
             
+            # Flatten once here; optimize_image() then sees RGB and skips it for both sizes
+            img = self.flatten_to_rgb(img)
             optimized_img = self.optimize_image(img, target_width, is_thumbnail=False)
-            thumb_img = self.optimize_image(img, is_thumbnail=True)
-            
-            main_buffer = io.BytesIO()
-            optimized_img.save(main_buffer, format="JPEG", quality=self.settings["quality"], optimize=True)
-            main_size = len(main_buffer.getvalue()) / (1024 * 1024)
-            
-            thumb_buffer = io.BytesIO()
-            thumb_img.save(thumb_buffer, format="JPEG", quality=70, optimize=True)
+            # The thumbnail only needs 200px, so derive it from the already downscaled page image
+            thumb_img = self.optimize_image(optimized_img, is_thumbnail=True)
             
             user_path = self.get_user_path()
-            with open(user_path / f"{image_id}.jpg", 'wb') as f: 
-                f.write(main_buffer.getvalue())
-            with open(user_path / "thumbnails" / f"{image_id}.jpg", 'wb') as f: 
-                f.write(thumb_buffer.getvalue())
+            main_future = ENCODE_POOL.submit(
+                save_jpeg, optimized_img, user_path / f"{image_id}.jpg", self.settings["quality"]
+            )
+            # Thumbnails are only ever shown in the browser, so they can be progressive;
+            # page images stay baseline for e-readers that cannot decode progressive JPEG
+            thumb_future = ENCODE_POOL.submit(
+                save_jpeg, thumb_img, user_path / "thumbnails" / f"{image_id}.jpg", 70, progressive=True
+            )
+            main_size = main_future.result() / (1024 * 1024)
+            thumb_future.result()
             
             metadata = {
                 "id": image_id, "session_id": session_id, "question": question_text,
@@ -1048,8 +1154,7 @@ class ImageHandler:
             
             metadata_path = self.base_path / "metadata" / f"{image_id}.json"
             metadata_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(metadata_path, 'w') as f: 
-                json.dump(metadata, f, indent=2)
+            dump_json_file(metadata_path, metadata)
             
             reduction = ((original_size - main_size) / original_size) * 100 if original_size > 0 else 0
             if reduction > 20:
@@ -1067,87 +1172,51 @@ class ImageHandler:
             logger.error(f"Error saving image: {e}")
             return None
     
-    def get_image_html(self, image_id, thumbnail=False):
-        try:
-            user_path = self.get_user_path()
-            path = user_path / "thumbnails" / f"{image_id}.jpg" if thumbnail else user_path / f"{image_id}.jpg"
-            if not path.exists(): 
-                return None
-            
-            with open(path, 'rb') as f: 
-                image_data = f.read()
-            b64 = base64.b64encode(image_data).decode()
-            
-            meta_path = self.base_path / "metadata" / f"{image_id}.json"
-            caption = ""
-            dimensions = ""
-            if meta_path.exists():
-                with open(meta_path, 'r') as f:
-                    metadata = json.load(f)
-                    caption = metadata.get("caption", "")
-                    dimensions = metadata.get("dimensions", "")
-            
-            return {
-                "html": f'<img src="data:image/jpeg;base64,{b64}" class="story-image" alt="{caption}" data-dimensions="{dimensions}">',
-                "caption": caption, "base64": b64, "dimensions": dimensions
-            }
-        except Exception as e:
-            logger.error(f"Error getting image HTML: {e}")
-            return None
-    
     def get_image_base64(self, image_id):
         try:
             user_path = self.get_user_path()
-            path = user_path / f"{image_id}.jpg"
-            if not path.exists(): 
-                return None
-            with open(path, 'rb') as f: 
+            with open(user_path / f"{image_id}.jpg", 'rb') as f: 
                 image_data = f.read()
             return base64.b64encode(image_data).decode()
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error getting image base64: {e}")
             return None
     
     def get_image_caption(self, image_id):
         meta_path = self.base_path / "metadata" / f"{image_id}.json"
-        if meta_path.exists():
-            try:
-                with open(meta_path, 'r') as f:
-                    metadata = json.load(f)
-                    return metadata.get("caption", "")
-            except Exception as e:
-                logger.error(f"Error getting image caption: {e}")
+        try:
+            return load_json_file(meta_path).get("caption", "")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error getting image caption: {e}")
         return ""
     
-    def get_images_for_answer(self, session_id, question_text):
-        images = []
-        metadata_dir = self.base_path / "metadata"
-        if not metadata_dir.exists(): 
-            return images
-        
+    def get_answer_image_metadata(self, session_id, question_text):
+        """Metadata for images attached to an answer, newest first, without reading image files."""
         try:
-            for fname in metadata_dir.glob("*.json"):
-                try:
-                    with open(fname) as f: 
-                        meta = json.load(f)
-                    if (meta.get("session_id") == session_id and 
-                        meta.get("question") == question_text and 
-                        meta.get("user_id") == self.user_id):
-                        thumb = self.get_image_html(meta["id"], thumbnail=True)
-                        full = self.get_image_html(meta["id"])
-                        if thumb and full:
-                            images.append({
-                                **meta, 
-                                "thumb_html": thumb["html"], 
-                                "full_html": full["html"]
-                            })
-                except Exception as e:
-                    logger.error(f"Error reading metadata {fname}: {e}")
-                    continue
+            by_answer = load_image_metadata(self.base_path / "metadata", load_json_file)
         except Exception as e:
             logger.error(f"Error listing metadata directory: {e}")
-        
-        return sorted(images, key=lambda x: x.get("timestamp", ""), reverse=True)
+            return []
+        # Hand back a copy so callers cannot reorder the cached group
+        return list(by_answer.get((self.user_id, session_id, question_text), ()))
+    
+    def get_images_for_answer(self, session_id, question_text):
+        """Images attached to an answer, newest first, with their thumbnail file path.
+
+        The editor passes the path to st.image, which serves the file through
+        Streamlit's media endpoint instead of inlining it as base64 on every rerun.
+        """
+        thumb_dir = self.get_user_path() / "thumbnails"
+        images = []
+        for meta in self.get_answer_image_metadata(session_id, question_text):
+            thumb_path = thumb_dir / f"{meta['id']}.jpg"
+            if thumb_path.exists():
+                images.append({**meta, "thumb_path": str(thumb_path)})
+        return images
     
     def delete_image(self, image_id):
         try:
@@ -1159,9 +1228,11 @@ class ImageHandler:
             ]
             
             for path in files_to_delete:
-                if path.exists():
+                try:
                     path.unlink()
                     logger.info(f"Deleted image file: {path}")
+                except FileNotFoundError:
+                    pass
             
             return True
         except Exception as e:
@@ -1173,6 +1244,31 @@ def init_image_handler():
         st.session_state.image_handler = ImageHandler(st.session_state.get('user_id'))
     return st.session_state.image_handler
 
+def get_upload_preview(uploaded_file, slot, max_size=400):
+    """Return small PNG preview bytes for an uploaded image, decoded once per upload.
+
+    Previews are cached in session_state per widget slot, so reruns reuse the
+    thumbnail instead of re-reading the full upload; a new upload replaces it.
+    """
+    cache = st.session_state.setdefault("_img_cache", {})
+    key = (getattr(uploaded_file, "file_id", uploaded_file.name), uploaded_file.size)
+    cached = cache.get(slot)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    try:
+        img = Image.open(io.BytesIO(uploaded_file.getvalue()))
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        preview = buffer.getvalue()
+    except Exception as e:
+        logger.error(f"Error creating upload preview: {e}")
+        return None
+
+    cache[slot] = (key, preview)
+    return preview
+
 # ============================================================================
 # AUTHENTICATION FUNCTIONS
 # ============================================================================
@@ -1188,7 +1284,8 @@ def verify_password(stored_hash, password):
 
 def create_user_account(user_data, password=None):
     try:
-        user_id = hashlib.sha256(f"{user_data['email']}{datetime.now().isoformat()}".encode()).hexdigest()[:12]
+        now_iso = datetime.now().isoformat()
+        user_id = hashlib.sha256(f"{user_data['email']}{now_iso}".encode()).hexdigest()[:12]
         if not password: 
             password = generate_password()
         user_record = {
@@ -1196,8 +1293,8 @@ def create_user_account(user_data, password=None):
             "email": user_data["email"].lower().strip(),
             "password_hash": hash_password(password), 
             "account_type": user_data.get("account_for", "self"),
-            "created_at": datetime.now().isoformat(), 
-            "last_login": datetime.now().isoformat(),
+            "created_at": now_iso, 
+            "last_login": now_iso,
             "profile": {
                 "first_name": user_data["first_name"], 
                 "last_name": user_data["last_name"],
@@ -1233,7 +1330,7 @@ def create_user_account(user_data, password=None):
                 "total_sessions": 0, 
                 "total_words": 0,
                 "account_age_days": 0, 
-                "last_active": datetime.now().isoformat()
+                "last_active": now_iso
             },
             "streak_data": {
                 "current_streak": 0,
@@ -1259,8 +1356,7 @@ def save_account_data(user_record):
     try:
         account_path = Path(f"accounts/{user_record['user_id']}_account.json")
         account_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(account_path, 'w') as f:
-            json.dump(user_record, f, indent=2)
+        write_file_atomic(account_path, json.dumps(user_record, separators=(",", ":")))
         update_accounts_index(user_record)
         logger.info(f"Account data saved for {user_record['user_id']}")
         return True
@@ -1284,8 +1380,7 @@ def update_accounts_index(user_record):
             "account_type": user_record['account_type']
         }
         
-        with open(index_file, 'w') as f: 
-            json.dump(index, f, indent=2)
+        write_file_atomic(index_file, json.dumps(index, separators=(",", ":")))
         
         return True
     except Exception as e:
@@ -1297,26 +1392,29 @@ def get_account_data(user_id=None, email=None):
         if user_id:
             account_path = Path(f"accounts/{user_id}_account.json")
             if account_path.exists(): 
-                with open(account_path, 'r') as f:
-                    return json.load(f)
+                return load_json_file(account_path)
         
         if email:
             email = email.lower().strip()
             index_file = Path("accounts/accounts_index.json")
             if index_file.exists():
-                with open(index_file, 'r') as f:
-                    index = json.load(f)
+                index = load_json_file(index_file)
                 for uid, data in index.items():
                     if data.get("email", "").lower() == email:
                         account_path = Path(f"accounts/{uid}_account.json")
                         if account_path.exists():
-                            with open(account_path, 'r') as f:
-                                return json.load(f)
+                            return load_json_file(account_path)
     except Exception as e:
         logger.error(f"Error getting account data: {e}")
     
     return None
 
+def profile_display_name(profile, fallback=""):
+    """Return "First Last" from an account profile, or fallback when no name is set."""
+    if profile and (name := f"{profile.get('first_name', '')} {profile.get('last_name', '')}".strip()):
+        return name
+    return fallback
+
 def authenticate_user(email, password):
     try:
         account = get_account_data(email=email)
@@ -1565,11 +1663,22 @@ def show_settings_panel():
         st.markdown("### 💾 Backup & Restore")
         
         st.markdown("**Create a complete backup of all your data:**")
-        backup_json = create_backup()
-        if backup_json:
+        # Only snapshot (and write a backup file) when the account or answers changed
+        backup_key = hashlib.md5(json.dumps(
+            [st.session_state.user_id, st.session_state.user_account, st.session_state.responses], default=str
+        ).encode()).hexdigest()
+        cached_backup = st.session_state.get("_settings_backup")
+        if cached_backup and cached_backup[0] == backup_key:
+            backup_bytes = cached_backup[1]
+        else:
+            backup_json = create_backup()
+            backup_bytes = backup_json.encode('utf-8') if backup_json else None
+            if backup_bytes:
+                st.session_state._settings_backup = (backup_key, backup_bytes)
+        if backup_bytes:
             st.download_button(
                 label="📥 Download Complete Backup",
-                data=backup_json,
+                data=backup_bytes,
                 file_name=f"tell_my_story_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json",
                 use_container_width=True,
@@ -1588,8 +1697,7 @@ def show_settings_panel():
             if st.button("🔄 RESTORE BACKUP (I understand the risk)", key="settings_restore_backup_btn", type="primary", use_container_width=True):
                 with st.spinner("Restoring your data..."):
                     try:
-                        backup_content = backup_file.read().decode('utf-8')
-                        if restore_from_backup(backup_content):
+                        if restore_from_backup(backup_file.getvalue()):
                             st.success("✅ Backup restored successfully! Your data has been recovered.")
                             time.sleep(2)
                             st.rerun()
@@ -1611,7 +1719,7 @@ def show_settings_panel():
                     if st.button(f"Restore", key=f"settings_restore_{b['filename']}"):
                         st.warning("⚠️ This will overwrite ALL current data!")
                         if st.button(f"✅ CONFIRM", key=f"settings_confirm_{b['filename']}"):
-                            with open(f"backups/{b['filename']}", 'r') as f:
+                            with open(f"backups/{b['filename']}", 'rb') as f:
                                 backup_content = f.read()
                             if restore_from_backup(backup_content):
                                 st.success("✅ Restored successfully!")
@@ -1631,67 +1739,65 @@ def get_narrative_gps_for_ai():
         if not gps:
             return ""
         
-        context = "\n\n=== BOOK PROJECT CONTEXT (From Narrative GPS) ===\n"
+        parts = ["\n\n=== BOOK PROJECT CONTEXT (From Narrative GPS) ===\n"]
         
         if gps.get('book_title') or gps.get('genre') or gps.get('book_length'):
-            context += "\n📖 PROJECT SCOPE:\n"
-            if gps.get('book_title'): context += f"- Book Title: {gps['book_title']}\n"
-            if gps.get('genre'): 
-                genre = gps['genre']
-                if genre == "Other" and gps.get('genre_other'):
-                    genre = gps['genre_other']
-                context += f"- Genre: {genre}\n"
-            if gps.get('book_length'): context += f"- Length Vision: {gps['book_length']}\n"
-            if gps.get('timeline'): context += f"- Timeline/Deadlines: {gps['timeline']}\n"
-            if gps.get('completion_status'): context += f"- Current Status: {gps['completion_status']}\n"
+            parts.append("\n📖 PROJECT SCOPE:\n")
+            if value := gps.get('book_title'): parts.append(f"- Book Title: {value}\n")
+            if genre := gps.get('genre'):
+                if genre == "Other" and (genre_other := gps.get('genre_other')):
+                    genre = genre_other
+                parts.append(f"- Genre: {genre}\n")
+            if value := gps.get('book_length'): parts.append(f"- Length Vision: {value}\n")
+            if value := gps.get('timeline'): parts.append(f"- Timeline/Deadlines: {value}\n")
+            if value := gps.get('completion_status'): parts.append(f"- Current Status: {value}\n")
         
         if gps.get('purposes') or gps.get('reader_takeaway'):
-            context += "\n🎯 PURPOSE & AUDIENCE:\n"
-            if gps.get('purposes'): 
-                context += f"- Core Purposes: {', '.join(gps['purposes'])}\n"
-            if gps.get('purpose_other'): context += f"- Other Purpose: {gps['purpose_other']}\n"
-            if gps.get('audience_family'): context += f"- Family Audience: {gps['audience_family']}\n"
-            if gps.get('audience_industry'): context += f"- Industry Audience: {gps['audience_industry']}\n"
-            if gps.get('audience_challenges'): context += f"- Audience Facing Similar Challenges: {gps['audience_challenges']}\n"
-            if gps.get('audience_general'): context += f"- General Audience: {gps['audience_general']}\n"
-            if gps.get('reader_takeaway'): context += f"- Reader Takeaway: {gps['reader_takeaway']}\n"
+            parts.append("\n🎯 PURPOSE & AUDIENCE:\n")
+            if value := gps.get('purposes'):
+                parts.append(f"- Core Purposes: {', '.join(value)}\n")
+            if value := gps.get('purpose_other'): parts.append(f"- Other Purpose: {value}\n")
+            if value := gps.get('audience_family'): parts.append(f"- Family Audience: {value}\n")
+            if value := gps.get('audience_industry'): parts.append(f"- Industry Audience: {value}\n")
+            if value := gps.get('audience_challenges'): parts.append(f"- Audience Facing Similar Challenges: {value}\n")
+            if value := gps.get('audience_general'): parts.append(f"- General Audience: {value}\n")
+            if value := gps.get('reader_takeaway'): parts.append(f"- Reader Takeaway: {value}\n")
         
         if gps.get('narrative_voices') or gps.get('emotional_tone'):
-            context += "\n🎭 TONE & VOICE:\n"
-            if gps.get('narrative_voices'): 
-                context += f"- Narrative Voice: {', '.join(gps['narrative_voices'])}\n"
-            if gps.get('voice_other'): context += f"- Other Voice: {gps['voice_other']}\n"
-            if gps.get('emotional_tone'): context += f"- Emotional Tone: {gps['emotional_tone']}\n"
-            if gps.get('language_style'): context += f"- Language Style: {gps['language_style']}\n"
+            parts.append("\n🎭 TONE & VOICE:\n")
+            if value := gps.get('narrative_voices'):
+                parts.append(f"- Narrative Voice: {', '.join(value)}\n")
+            if value := gps.get('voice_other'): parts.append(f"- Other Voice: {value}\n")
+            if value := gps.get('emotional_tone'): parts.append(f"- Emotional Tone: {value}\n")
+            if value := gps.get('language_style'): parts.append(f"- Language Style: {value}\n")
         
         if gps.get('time_coverage') or gps.get('sensitive_material') or gps.get('inclusions'):
-            context += "\n📋 CONTENT PARAMETERS:\n"
-            if gps.get('time_coverage'): context += f"- Time Coverage: {gps['time_coverage']}\n"
-            if gps.get('sensitive_material'): context += f"- Sensitive Topics: {gps['sensitive_material']}\n"
-            if gps.get('sensitive_people'): context += f"- Sensitive People: {gps['sensitive_people']}\n"
-            if gps.get('inclusions'): 
-                context += f"- Planned Inclusions: {', '.join(gps['inclusions'])}\n"
-            if gps.get('locations'): context += f"- Key Locations: {gps['locations']}\n"
+            parts.append("\n📋 CONTENT PARAMETERS:\n")
+            if value := gps.get('time_coverage'): parts.append(f"- Time Coverage: {value}\n")
+            if value := gps.get('sensitive_material'): parts.append(f"- Sensitive Topics: {value}\n")
+            if value := gps.get('sensitive_people'): parts.append(f"- Sensitive People: {value}\n")
+            if value := gps.get('inclusions'):
+                parts.append(f"- Planned Inclusions: {', '.join(value)}\n")
+            if value := gps.get('locations'): parts.append(f"- Key Locations: {value}\n")
         
         if gps.get('materials') or gps.get('people_to_interview'):
-            context += "\n📦 RESOURCES:\n"
-            if gps.get('materials'): 
-                context += f"- Available Materials: {', '.join(gps['materials'])}\n"
-            if gps.get('people_to_interview'): context += f"- People to Interview: {gps['people_to_interview']}\n"
-            if gps.get('legal'): 
-                context += f"- Legal Considerations: {', '.join(gps['legal'])}\n"
+            parts.append("\n📦 RESOURCES:\n")
+            if value := gps.get('materials'):
+                parts.append(f"- Available Materials: {', '.join(value)}\n")
+            if value := gps.get('people_to_interview'): parts.append(f"- People to Interview: {value}\n")
+            if value := gps.get('legal'):
+                parts.append(f"- Legal Considerations: {', '.join(value)}\n")
         
         if gps.get('involvement') or gps.get('unspoken'):
-            context += "\n🤝 COLLABORATION:\n"
-            if gps.get('involvement'): 
-                involvement = gps['involvement']
-                if involvement == "Mixed approach: [explain]" and gps.get('involvement_explain'):
-                    involvement = f"Mixed approach: {gps['involvement_explain']}"
-                context += f"- Working Style: {involvement}\n"
-            if gps.get('feedback_style'): context += f"- Feedback Preference: {gps['feedback_style']}\n"
-            if gps.get('unspoken'): context += f"- Hopes for Collaboration: {gps['unspoken']}\n"
-        
-        return context
+            parts.append("\n🤝 COLLABORATION:\n")
+            if involvement := gps.get('involvement'):
+                if involvement == "Mixed approach: [explain]" and (explain := gps.get('involvement_explain')):
+                    involvement = f"Mixed approach: {explain}"
+                parts.append(f"- Working Style: {involvement}\n")
+            if value := gps.get('feedback_style'): parts.append(f"- Feedback Preference: {value}\n")
+            if value := gps.get('unspoken'): parts.append(f"- Hopes for Collaboration: {value}\n")
+        
+        return "".join(parts)
     except Exception as e:
         logger.error(f"Error getting narrative GPS: {e}")
         return ""
@@ -1713,9 +1819,9 @@ def ai_rewrite_answer(original_text, person_option, question_text, session_title
             ep = st.session_state.user_account['enhanced_profile']
             if ep:
                 enhanced_context = "\n\n=== ADDITIONAL BIOGRAPHER CONTEXT ===\n"
-                if ep.get('birth_place'): enhanced_context += f"• Born: {ep['birth_place']}\n"
-                if ep.get('life_lessons'): enhanced_context += f"• Life Philosophy: {ep['life_lessons'][:200]}...\n"
-                if ep.get('legacy'): enhanced_context += f"• Legacy Hope: {ep['legacy'][:200]}...\n"
+                if value := ep.get('birth_place'): enhanced_context += f"• Born: {value}\n"
+                if value := ep.get('life_lessons'): enhanced_context += f"• Life Philosophy: {value[:200]}...\n"
+                if value := ep.get('legacy'): enhanced_context += f"• Legacy Hope: {value[:200]}...\n"
         
         clean_text = re.sub(r'<[^>]+>', '', original_text)
         
@@ -2358,13 +2464,23 @@ def render_narrative_gps():
 def get_user_filename(user_id):
     return f"user_data_{hashlib.md5(user_id.encode()).hexdigest()[:8]}.json"
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def read_user_data_file(fname, file_signature):
+    """Parse a user data file; file_signature (mtime_ns, size, inode) is only the cache key.
+
+    st.cache_data hands every caller its own copy, so callers may mutate the result.
+    """
+    return load_json_file(fname)
+
 def load_user_data(user_id):
     fname = get_user_filename(user_id)
     try:
-        if os.path.exists(fname):
-            with open(fname, 'r') as f:
-                return json.load(f)
-        return {"responses": {}, "vignettes": [], "last_loaded": datetime.now().isoformat()}
+        try:
+            stat = os.stat(fname)
+        except FileNotFoundError:
+            return {"responses": {}, "vignettes": [], "last_loaded": datetime.now().isoformat()}
+        # Atomic saves replace the file, so the inode changes even if mtime and size collide
+        return read_user_data_file(fname, (stat.st_mtime_ns, stat.st_size, stat.st_ino))
     except Exception as e:
         logger.error(f"Error loading user data: {e}")
         return {"responses": {}, "vignettes": [], "last_loaded": datetime.now().isoformat()}
@@ -2373,6 +2489,14 @@ def save_user_data(user_id, responses_data):
     fname = get_user_filename(user_id)
     try:
         existing = load_user_data(user_id)
+        # Skip the rewrite (and the auto-backup) when the file on disk already holds
+        # these responses. Comparing with the file itself, rather than with what this
+        # session last wrote, stays correct when another writer changes it; JSON keys
+        # are strings, so session ids are compared as strings. A missing or unreadable
+        # file loads as a stub without user_id, so it is always written
+        if existing.get("user_id") == user_id and existing.get("responses") == {str(sid): sdata for sid, sdata in responses_data.items()}:
+            return True
+        
         data = {
             "user_id": user_id, 
             "responses": responses_data,
@@ -2381,8 +2505,7 @@ def save_user_data(user_id, responses_data):
             "vignette_beta_feedback": existing.get("vignette_beta_feedback", {}),
             "last_saved": datetime.now().isoformat()
         }
-        with open(fname, 'w') as f: 
-            json.dump(data, f, indent=2)
+        write_file_atomic(fname, json.dumps(data, separators=(",", ":")))
         
         # Create auto-backup after successful save
         auto_backup_user_data()
@@ -2401,15 +2524,15 @@ def save_response(session_id, question, answer):
         return False
     
     try:
-        text_only = re.sub(r'<[^>]+>', '', answer) if answer else ""
+        text_only = TAG_RE.sub('', answer) if answer else ""
         
         if st.session_state.user_account:
-            word_count = len(re.findall(r'\w+', text_only))
+            word_count = count_word_tokens(text_only)
             st.session_state.user_account["stats"]["total_words"] = st.session_state.user_account["stats"].get("total_words", 0) + word_count
             st.session_state.user_account["stats"]["last_active"] = datetime.now().isoformat()
-            save_account_data(st.session_state.user_account)
-            
+            # Stats, streak and milestones all land in the account, so write it once
             update_writing_streak(user_id)
+            save_account_data(st.session_state.user_account)
         
         if session_id not in st.session_state.responses:
             session_data = next((s for s in (st.session_state.current_question_bank or []) if s["id"] == session_id), 
@@ -2424,7 +2547,7 @@ def save_response(session_id, question, answer):
         
         images = []
         if st.session_state.image_handler:
-            images = st.session_state.image_handler.get_images_for_answer(session_id, question)
+            images = st.session_state.image_handler.get_answer_image_metadata(session_id, question)
         
         st.session_state.responses[session_id]["questions"][question] = {
             "answer": answer, 
@@ -2468,11 +2591,12 @@ def delete_response(session_id, question):
 def calculate_author_word_count(session_id):
     total = 0
     try:
-        if session_id in st.session_state.responses:
-            for q, d in st.session_state.responses[session_id].get("questions", {}).items():
-                if d.get("answer"): 
-                    text_only = re.sub(r'<[^>]+>', '', d["answer"])
-                    total += len(re.findall(r'\w+', text_only))
+        sdata = st.session_state.responses.get(session_id)
+        if sdata:
+            for d in sdata["questions"].values():
+                answer = d.get("answer")
+                if answer: 
+                    total += count_word_tokens(TAG_RE.sub('', answer))
     except Exception as e:
         logger.error(f"Error calculating word count: {e}")
     return total
@@ -2513,6 +2637,92 @@ def get_progress_info(session_id):
             "status_text": "Error calculating progress"
         }
 
+def ensure_session_responses(sessions):
+    """Give every session a responses entry with a "questions" dict.
+
+    Run once per rerun after user data is loaded so later code can index
+    responses[sid]["questions"] directly instead of chaining .get() defaults.
+    """
+    responses = st.session_state.responses
+    for session in sessions:
+        sdata = responses.get(session["id"])
+        if sdata is None:
+            responses[session["id"]] = {
+                "title": session.get("title", f"Session {session['id']}"),
+                "questions": {}, 
+                "summary": "", 
+                "completed": False,
+                "word_target": session.get("word_target", DEFAULT_WORD_TARGET)
+            }
+        elif "questions" not in sdata:
+            sdata["questions"] = {}
+
+def get_export_data():
+    """Return the stories export list, rebuilt only when the saved answers change.
+
+    The list embeds every image as base64, so it is cached in session_state
+    under a fingerprint of (session, question, timestamp, image ids).
+    """
+    responses = st.session_state.responses
+    sessions = st.session_state.current_question_bank or []
+    fingerprint = hash((st.session_state.user_id, tuple(
+        (session["id"], q, a.get("timestamp", ""), tuple(img.get("id") for img in a.get("images", [])))
+        for session in sessions
+        for q, a in responses[session["id"]]["questions"].items()
+    )))
+    if st.session_state.get("_export_fp") == fingerprint:
+        return st.session_state._export_data
+    
+    export_data = []
+    image_handler = st.session_state.image_handler
+    # Image files never change once saved, so carry the previous build's
+    # base64 over by id instead of re-reading and re-encoding every image
+    previous_b64 = {
+        img["id"]: img["base64"]
+        for item in st.session_state.get("_export_data") or ()
+        for img in item["images"]
+    }
+    for session in sessions:
+        sid = session["id"]
+        session_title = session["title"]
+        questions = responses[sid]["questions"]
+        if not questions:
+            continue
+        for q, a in questions.items():
+            answer_text = TAG_RE.sub('', a.get("answer", ""))
+            image_refs = a.get("images")
+            # Leave blank answers (e.g. an editor that only saved "<p><br></p>") out of the book
+            if (not answer_text or answer_text.isspace()) and not image_refs:
+                continue
+            
+            images_with_data = []
+            if image_refs and image_handler:
+                # Dedupe refs by id before reading and encoding the files
+                for img_ref in {ref.get("id"): ref for ref in image_refs}.values():
+                    img_id = img_ref.get("id")
+                    b64 = previous_b64.get(img_id) or image_handler.get_image_base64(img_id)
+                    if b64:
+                        images_with_data.append({
+                            "id": img_id, "base64": b64, "caption": img_ref.get("caption", "")
+                        })
+            
+            export_item = {
+                "question": q, 
+                "answer_text": answer_text,
+                "word_count": count_words(answer_text),
+                "timestamp": a.get("timestamp", ""), 
+                "session_id": sid, 
+                "session_title": session_title,
+                "has_images": a.get("has_images", False), 
+                "image_count": a.get("image_count", 0),
+                "images": images_with_data
+            }
+            export_data.append(export_item)
+    
+    st.session_state._export_fp = fingerprint
+    st.session_state._export_data = export_data
+    return export_data
+
 def auto_correct_text(text):
     if not text or not client: 
         return text
@@ -2536,38 +2746,52 @@ def auto_correct_text(text):
 # ============================================================================
 # SEARCH FUNCTIONALITY
 # ============================================================================
+@dataclass
+class SearchResult:
+    """One matching answer from search_all_answers()."""
+    __slots__ = ("session_id", "session_title", "question", "answer", "timestamp",
+                 "word_count", "has_images", "image_count")
+    session_id: int
+    session_title: str
+    question: str
+    answer: str
+    timestamp: str
+    word_count: int
+    has_images: bool
+    image_count: int
+
 def search_all_answers(search_query):
     if not search_query or len(search_query) < 2: 
         return []
     
     results = []
-    search_query = search_query.lower()
+    # One case-insensitive scan per field instead of lower()-copying every answer
+    query_re = re.compile(re.escape(search_query), re.IGNORECASE)
     
     try:
         for session in (st.session_state.current_question_bank or []):
             session_id = session["id"]
-            session_data = st.session_state.responses.get(session_id, {})
-            
-            for question_text, answer_data in session_data.get("questions", {}).items():
+            session_title = session["title"]
+            for question_text, answer_data in st.session_state.responses[session_id]["questions"].items():
                 html_answer = answer_data.get("answer", "")
-                text_answer = re.sub(r'<[^>]+>', '', html_answer)
+                text_answer = TAG_RE.sub('', html_answer)
                 has_images = answer_data.get("has_images", False) or ('<img' in html_answer)
                 
-                if search_query in text_answer.lower() or search_query in question_text.lower():
-                    results.append({
-                        "session_id": session_id, 
-                        "session_title": session["title"],
-                        "question": question_text, 
-                        "answer": text_answer[:300] + "..." if len(text_answer) > 300 else text_answer,
-                        "timestamp": answer_data.get("timestamp", ""), 
-                        "word_count": len(text_answer.split()),
-                        "has_images": has_images, 
-                        "image_count": answer_data.get("image_count", 0)
-                    })
+                if query_re.search(text_answer) or query_re.search(question_text):
+                    results.append(SearchResult(
+                        session_id=session_id, 
+                        session_title=session_title,
+                        question=question_text, 
+                        answer=text_answer[:300] + "..." if len(text_answer) > 300 else text_answer,
+                        timestamp=answer_data.get("timestamp", ""), 
+                        word_count=count_words(text_answer),
+                        has_images=has_images, 
+                        image_count=answer_data.get("image_count", 0)
+                    ))
     except Exception as e:
         logger.error(f"Error searching answers: {e}")
     
-    results.sort(key=lambda x: x["timestamp"], reverse=True)
+    results.sort(key=attrgetter("timestamp"), reverse=True)
     return results
 
 # ============================================================================
@@ -2658,106 +2882,119 @@ def load_question_bank(sessions, bank_name, bank_type, bank_id=None):
 # ============================================================================
 # BETA READER FUNCTIONS
 # ============================================================================
+_BRIEFING_RULE = "=" * 80 + "\n"
+_BRIEFING_SUB_RULE = "-" * 50 + "\n"
+
+_PROFILE_MARKER_RE = re.compile(r'\[PROFILE:.*?\]')
+_PROFILE_MARKER_SPAN = '<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 6px; border-radius: 4px; border-left: 3px solid #0366d6;">{part}</span>'
+
+def highlight_profile_markers(feedback_text):
+    """Wrap each [PROFILE: ...] marker in the feedback in a highlight span, in one regex pass."""
+    return _PROFILE_MARKER_RE.sub(lambda m: _PROFILE_MARKER_SPAN.format(part=m.group()), feedback_text)
+
 def generate_beta_reader_feedback(session_title, session_text, feedback_type="comprehensive"):
     if not beta_reader: 
         return {"error": "BetaReader not available"}
     
     try:
         accessed_profile_sections = []
-        profile_context = "\n\n" + "="*80 + "\n"
-        profile_context += "📋 BIOGRAPHER'S INTELLIGENCE BRIEFING\n"
-        profile_context += "="*80 + "\n"
-        profile_context += "The Beta Reader has accessed the following profile information to provide contextual feedback:\n\n"
+        profile_parts = [
+            f"\n\n{_BRIEFING_RULE}📋 BIOGRAPHER'S INTELLIGENCE BRIEFING\n{_BRIEFING_RULE}"
+            "The Beta Reader has accessed the following profile information to provide contextual feedback:\n\n"
+        ]
         
         if st.session_state.user_account:
             gps = st.session_state.user_account.get('narrative_gps', {})
             if gps:
-                profile_context += "\n📖 SECTION 1: BOOK PROJECT CONTEXT (From Narrative GPS)\n"
-                profile_context += "-" * 50 + "\n"
+                profile_parts.append("\n📖 SECTION 1: BOOK PROJECT CONTEXT (From Narrative GPS)\n")
+                profile_parts.append(_BRIEFING_SUB_RULE)
                 
                 if gps.get('book_title'):
-                    profile_context += f"• Book Title: {gps['book_title']}\n"
+                    profile_parts.append(f"• Book Title: {gps['book_title']}\n")
                     accessed_profile_sections.append("Book Title")
                 if gps.get('genre'):
                     genre = gps['genre']
                     if genre == "Other" and gps.get('genre_other'):
                         genre = gps['genre_other']
-                    profile_context += f"• Genre: {genre}\n"
+                    profile_parts.append(f"• Genre: {genre}\n")
                     accessed_profile_sections.append("Genre")
                 if gps.get('purposes'):
-                    profile_context += f"• Purpose: {', '.join(gps['purposes'])}\n"
+                    profile_parts.append(f"• Purpose: {', '.join(gps['purposes'])}\n")
                     accessed_profile_sections.append("Book Purpose")
                 if gps.get('reader_takeaway'):
-                    profile_context += f"• Reader Takeaway: {gps['reader_takeaway']}\n"
+                    profile_parts.append(f"• Reader Takeaway: {gps['reader_takeaway']}\n")
                     accessed_profile_sections.append("Reader Takeaway")
                 if gps.get('emotional_tone'):
-                    profile_context += f"• Emotional Tone: {gps['emotional_tone']}\n"
+                    profile_parts.append(f"• Emotional Tone: {gps['emotional_tone']}\n")
                     accessed_profile_sections.append("Emotional Tone")
                 if gps.get('narrative_voices'):
-                    profile_context += f"• Narrative Voice: {', '.join(gps['narrative_voices'])}\n"
+                    profile_parts.append(f"• Narrative Voice: {', '.join(gps['narrative_voices'])}\n")
                     accessed_profile_sections.append("Narrative Voice")
                 if gps.get('time_coverage'):
-                    profile_context += f"• Time Coverage: {gps['time_coverage']}\n"
+                    profile_parts.append(f"• Time Coverage: {gps['time_coverage']}\n")
                     accessed_profile_sections.append("Time Coverage")
                 if gps.get('audience_family') or gps.get('audience_industry'):
-                    profile_context += f"• Target Audience: "
+                    profile_parts.append(f"• Target Audience: ")
                     audiences = []
                     if gps.get('audience_family'): audiences.append(f"Family ({gps['audience_family']})")
                     if gps.get('audience_industry'): audiences.append(f"Industry ({gps['audience_industry']})")
                     if gps.get('audience_general'): audiences.append(f"General ({gps['audience_general']})")
-                    profile_context += f"{', '.join(audiences)}\n"
+                    profile_parts.append(f"{', '.join(audiences)}\n")
                     accessed_profile_sections.append("Target Audience")
             
             ep = st.session_state.user_account.get('enhanced_profile', {})
             if ep:
-                profile_context += "\n\n👤 SECTION 2: SUBJECT BIOGRAPHY (From Enhanced Profile)\n"
-                profile_context += "-" * 50 + "\n"
+                profile_parts.append("\n\n👤 SECTION 2: SUBJECT BIOGRAPHY (From Enhanced Profile)\n")
+                profile_parts.append(_BRIEFING_SUB_RULE)
                 
                 if ep.get('birth_place'):
-                    profile_context += f"• Birth Place: {ep['birth_place']}\n"
+                    profile_parts.append(f"• Birth Place: {ep['birth_place']}\n")
                     accessed_profile_sections.append("Birth Place")
                 if ep.get('parents'):
-                    profile_context += f"• Parents: {ep['parents'][:150]}...\n" if len(ep['parents']) > 150 else f"• Parents: {ep['parents']}\n"
+                    profile_parts.append(f"• Parents: {ep['parents'][:150]}...\n" if len(ep['parents']) > 150 else f"• Parents: {ep['parents']}\n")
                     accessed_profile_sections.append("Family Background")
                 if ep.get('childhood_home'):
-                    profile_context += f"• Childhood Home: {ep['childhood_home'][:150]}...\n" if len(ep['childhood_home']) > 150 else f"• Childhood Home: {ep['childhood_home']}\n"
+                    profile_parts.append(f"• Childhood Home: {ep['childhood_home'][:150]}...\n" if len(ep['childhood_home']) > 150 else f"• Childhood Home: {ep['childhood_home']}\n")
                     accessed_profile_sections.append("Childhood")
                 if ep.get('family_traditions'):
-                    profile_context += f"• Family Traditions: {ep['family_traditions'][:150]}...\n" if len(ep['family_traditions']) > 150 else f"• Family Traditions: {ep['family_traditions']}\n"
+                    profile_parts.append(f"• Family Traditions: {ep['family_traditions'][:150]}...\n" if len(ep['family_traditions']) > 150 else f"• Family Traditions: {ep['family_traditions']}\n")
                     accessed_profile_sections.append("Family Traditions")
                 if ep.get('school'):
-                    profile_context += f"• Education: {ep['school'][:150]}...\n" if len(ep['school']) > 150 else f"• Education: {ep['school']}\n"
+                    profile_parts.append(f"• Education: {ep['school'][:150]}...\n" if len(ep['school']) > 150 else f"• Education: {ep['school']}\n")
                     accessed_profile_sections.append("Education")
                 if ep.get('career_path'):
-                    profile_context += f"• Career: {ep['career_path'][:150]}...\n" if len(ep['career_path']) > 150 else f"• Career: {ep['career_path']}\n"
+                    profile_parts.append(f"• Career: {ep['career_path'][:150]}...\n" if len(ep['career_path']) > 150 else f"• Career: {ep['career_path']}\n")
                     accessed_profile_sections.append("Career")
                 if ep.get('romance') or ep.get('marriage'):
-                    profile_context += f"• Relationships: "
-                    if ep.get('marriage'): profile_context += f"Married - {ep['marriage'][:100]}... " if len(ep['marriage']) > 100 else f"Married - {ep['marriage']} "
-                    if ep.get('children'): profile_context += f"Children - {ep['children'][:100]}... " if len(ep['children']) > 100 else f"Children - {ep['children']} "
-                    profile_context += "\n"
+                    profile_parts.append(f"• Relationships: ")
+                    if ep.get('marriage'): profile_parts.append(f"Married - {ep['marriage'][:100]}... " if len(ep['marriage']) > 100 else f"Married - {ep['marriage']} ")
+                    if ep.get('children'): profile_parts.append(f"Children - {ep['children'][:100]}... " if len(ep['children']) > 100 else f"Children - {ep['children']} ")
+                    profile_parts.append("\n")
                     accessed_profile_sections.append("Relationships")
                 if ep.get('challenges'):
-                    profile_context += f"• Life Challenges: {ep['challenges'][:150]}...\n" if len(ep['challenges']) > 150 else f"• Life Challenges: {ep['challenges']}\n"
+                    profile_parts.append(f"• Life Challenges: {ep['challenges'][:150]}...\n" if len(ep['challenges']) > 150 else f"• Life Challenges: {ep['challenges']}\n")
                     accessed_profile_sections.append("Challenges")
                 if ep.get('life_lessons'):
-                    profile_context += f"• Life Philosophy: {ep['life_lessons'][:150]}...\n" if len(ep['life_lessons']) > 150 else f"• Life Philosophy: {ep['life_lessons']}\n"
+                    profile_parts.append(f"• Life Philosophy: {ep['life_lessons'][:150]}...\n" if len(ep['life_lessons']) > 150 else f"• Life Philosophy: {ep['life_lessons']}\n")
                     accessed_profile_sections.append("Life Philosophy")
                 if ep.get('legacy'):
-                    profile_context += f"• Legacy Hope: {ep['legacy'][:150]}...\n" if len(ep['legacy']) > 150 else f"• Legacy Hope: {ep['legacy']}\n"
+                    profile_parts.append(f"• Legacy Hope: {ep['legacy'][:150]}...\n" if len(ep['legacy']) > 150 else f"• Legacy Hope: {ep['legacy']}\n")
                     accessed_profile_sections.append("Legacy Hope")
         
         if accessed_profile_sections:
-            profile_context += f"\n📊 PROFILE SECTIONS USED: {', '.join(set(accessed_profile_sections))}\n"
+            profile_parts.append(f"\n📊 PROFILE SECTIONS USED: {', '.join(dict.fromkeys(accessed_profile_sections))}\n")
         else:
-            profile_context += "\n⚠️ No profile information found. Complete your profile for personalized feedback!\n"
-        
-        profile_context += "\n" + "="*80 + "\n"
-        profile_context += "📝 BETA READER INSTRUCTIONS: Use the above profile information to provide personalized feedback.\n"
-        profile_context += "When your feedback is influenced by specific profile details, mark it with [PROFILE: section_name]\n"
-        profile_context += "="*80 + "\n\n"
+            profile_parts.append("\n⚠️ No profile information found. Complete your profile for personalized feedback!\n")
+        profile_parts.append(
+            f"\n{_BRIEFING_RULE}"
+            "📝 BETA READER INSTRUCTIONS: Use the above profile information to provide personalized feedback.\n"
+            "When your feedback is influenced by specific profile details, mark it with [PROFILE: section_name]\n"
+            f"{_BRIEFING_RULE}\n"
+        )
+        profile_parts.append("\n=== SESSION CONTENT TO REVIEW ===\n\n")
+        profile_parts.append(session_text)
         
-        full_context = profile_context + "\n=== SESSION CONTENT TO REVIEW ===\n\n" + session_text
+        full_context = "".join(profile_parts)
         
         return beta_reader.generate_feedback(session_title, full_context, feedback_type, accessed_profile_sections)
         
@@ -2799,8 +3036,7 @@ def save_beta_feedback(user_id, session_id, feedback_data):
         
         user_data["beta_feedback"][session_key].append(feedback_copy)
         
-        with open(filename, 'w') as f:
-            json.dump(user_data, f, indent=2)
+        write_file_atomic(filename, json.dumps(user_data, separators=(",", ":")))
         
         logger.info(f"Beta feedback saved for user {user_id}")
         return True
@@ -2827,7 +3063,7 @@ def display_saved_feedback(user_id, session_id):
     session_feedback.sort(key=lambda x: x.get('generated_at', ''), reverse=True)
     
     for i, fb in enumerate(session_feedback):
-        with st.expander(f"Feedback from {datetime.fromisoformat(fb['generated_at']).strftime('%B %d, %Y at %I:%M %p')}"):
+        with st.expander(f"Feedback from {format_feedback_date(fb['generated_at'])}"):
             col1, col2, col3 = st.columns([1, 1, 1])
             
             with col1:
@@ -2891,8 +3127,7 @@ def save_vignette_beta_feedback(user_id, vignette_id, feedback_data, vignette_ti
         
         user_data["vignette_beta_feedback"][vignette_key].append(feedback_copy)
         
-        with open(filename, 'w') as f:
-            json.dump(user_data, f, indent=2)
+        write_file_atomic(filename, json.dumps(user_data, separators=(",", ":")))
         
         logger.info(f"Vignette beta feedback saved for user {user_id}")
         return True
@@ -2949,15 +3184,7 @@ def display_beta_feedback(feedback_data):
         if 'feedback' in feedback_data and feedback_data['feedback']:
             feedback_text = feedback_data['feedback']
             
-            parts = re.split(r'(\[PROFILE:.*?\])', feedback_text)
-            formatted_feedback = ""
-            for i, part in enumerate(parts):
-                if part.startswith('[PROFILE:') and part.endswith(']'):
-                    formatted_feedback += f'<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 6px; border-radius: 4px; border-left: 3px solid #0366d6;">{part}</span>'
-                else:
-                    formatted_feedback += part
-            
-            st.markdown(formatted_feedback, unsafe_allow_html=True)
+            st.markdown(highlight_profile_markers(feedback_text), unsafe_allow_html=True)
         else:
             if 'summary' in feedback_data and feedback_data['summary']:
                 st.markdown("**Summary:**")
@@ -3086,14 +3313,7 @@ def show_vignette_modal():
                 
                 if 'feedback' in fb and fb['feedback']:
                     feedback_text = fb['feedback']
-                    parts = re.split(r'(\[PROFILE:.*?\])', feedback_text)
-                    formatted_feedback = ""
-                    for part in parts:
-                        if part.startswith('[PROFILE:') and part.endswith(']'):
-                            formatted_feedback += f'<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 6px; border-radius: 4px; border-left: 3px solid #0366d6;">{part}</span>'
-                        else:
-                            formatted_feedback += part
-                    st.markdown(formatted_feedback, unsafe_allow_html=True)
+                    st.markdown(highlight_profile_markers(feedback_text), unsafe_allow_html=True)
                 else:
                     if 'summary' in fb:
                         st.info(fb['summary'])
@@ -3249,14 +3469,7 @@ def show_vignette_detail():
             
             if 'feedback' in fb and fb['feedback']:
                 feedback_text = fb['feedback']
-                parts = re.split(r'(\[PROFILE:.*?\])', feedback_text)
-                formatted_feedback = ""
-                for part in parts:
-                    if part.startswith('[PROFILE:') and part.endswith(']'):
-                        formatted_feedback += f'<span style="background-color: #e8f4fd; color: #0366d6; font-weight: bold; padding: 2px 6px; border-radius: 4px; border-left: 3px solid #0366d6;">{part}</span>'
-                    else:
-                        formatted_feedback += part
-                st.markdown(formatted_feedback, unsafe_allow_html=True)
+                st.markdown(highlight_profile_markers(feedback_text), unsafe_allow_html=True)
             else:
                 if 'summary' in fb:
                     st.info(fb['summary'])
@@ -3374,8 +3587,8 @@ def show_session_manager():
         st.rerun()
     
     st.divider()
-    mgr.display_session_grid(cols=2, on_session_select=lambda sid: [st.session_state.update(
-        current_session=i, current_question=0, current_question_override=None) for i, s in enumerate(st.session_state.current_question_bank) if s["id"] == sid][0])
+    mgr.display_session_grid(cols=2, on_session_select=lambda sid: st.session_state.update(
+        current_session=SESSION_INDEX[sid], current_question=0, current_question_override=None))
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -3439,7 +3652,7 @@ def import_text_file_main(uploaded_file):
                 from docx import Document
                 docx_bytes = io.BytesIO(uploaded_file.getvalue())
                 doc = Document(docx_bytes)
-                paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+                paragraphs = [text for para in doc.paragraphs if (text := para.text) and not text.isspace()]
                 file_content = '\n\n'.join(paragraphs)
             except ImportError:
                 st.error("Please install: pip install python-docx")
@@ -3456,19 +3669,21 @@ def import_text_file_main(uploaded_file):
         
         elif file_extension in ['vtt', 'srt']:
             file_content = uploaded_file.read().decode('utf-8', errors='ignore')
-            lines = file_content.split('\n')
-            clean_lines = [line.strip() for line in lines if '-->' not in line and not line.strip().isdigit() and line.strip()]
+            clean_lines = [stripped for line in file_content.splitlines()
+                           if (stripped := line.strip()) and '-->' not in stripped and not stripped.isdigit()]
             file_content = ' '.join(clean_lines)
         
         elif file_extension == 'json':
+            if uploaded_file.size > MAX_JSON_UPLOAD_BYTES:
+                st.error("JSON file is too large to import")
+                return None
             try:
-                import json
-                data = json.loads(uploaded_file.read().decode('utf-8'))
+                data = json_loads(uploaded_file.getvalue())
                 if isinstance(data, dict):
                     file_content = data.get('text', data.get('transcript', str(data)))
                 else:
                     file_content = str(data)
-            except Exception as e:
+            except ValueError as e:
                 st.error(f"Error parsing JSON: {e}")
                 return None
         
@@ -3482,7 +3697,7 @@ def import_text_file_main(uploaded_file):
             st.info("Supported: .txt, .docx, .rtf, .vtt, .srt, .json, .md")
             return None
         
-        if not file_content or not file_content.strip():
+        if not file_content or file_content.isspace():
             st.warning("File is empty")
             return None
         
@@ -3495,8 +3710,8 @@ def import_text_file_main(uploaded_file):
         current_para = []
         
         for sentence in sentences:
-            if sentence.strip():
-                current_para.append(sentence.strip() + '.')
+            if stripped := sentence.strip():
+                current_para.append(stripped + '.')
                 if len(current_para) >= 4:
                     paragraphs.append(' '.join(current_para))
                     current_para = []
@@ -3507,11 +3722,10 @@ def import_text_file_main(uploaded_file):
         if not paragraphs:
             paragraphs = [file_content]
         
-        html_content = ''
-        for para in paragraphs:
-            if para.strip():
-                para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                html_content += f'<p>{para.strip()}</p>'
+        html_content = ''.join(
+            f"<p>{para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').strip()}</p>"
+            for para in paragraphs if para.strip()
+        )
         
         return html_content
         
@@ -3535,7 +3749,7 @@ if st.session_state.logged_in and st.session_state.user_id and not st.session_st
         for sid_str, sdata in user_data["responses"].items():
             try: 
                 sid = int(sid_str)
-            except: 
+            except ValueError: 
                 continue
             if sid in st.session_state.responses and "questions" in sdata and sdata["questions"]:
                 st.session_state.responses[sid]["questions"] = sdata["questions"]
@@ -3549,6 +3763,18 @@ if not SESSIONS:
         st.session_state.show_bank_manager = True; 
         st.rerun()
     st.stop()
+
+ensure_session_responses(SESSIONS)
+
+# Answered/total question counts per session, computed once per rerun and
+# shared by the sidebar, the gamification dashboard and the bottom stats.
+SESSION_COUNTS = {
+    s["id"]: (len(st.session_state.responses[s["id"]]["questions"]), len(s["questions"]))
+    for s in SESSIONS
+}
+TOTAL_ANSWERS = sum(answered for answered, _ in SESSION_COUNTS.values())
+SESSION_INDEX = {s["id"]: i for i, s in enumerate(SESSIONS)}
+
 # ============================================================================
 # ENHANCED ADMIN USER MANAGEMENT
 # ============================================================================
@@ -3572,21 +3798,23 @@ def show_admin_panel():
         with open(index_file, 'r') as f:
             index_data = json.load(f)
             
+        now = datetime.now()
+        today_str = now.date().isoformat()
         for user_id, user_info in index_data.items():
             # Load full account data for additional info
             account = get_account_data(user_id=user_id)
             
             if account:
-                # Calculate account age
-                created = datetime.fromisoformat(account.get('created_at', datetime.now().isoformat()))
-                age_days = (datetime.now() - created).days
+                # Calculate account age (accounts without a creation stamp count as new today)
+                created_at = account.get('created_at')
+                age_days = (now - datetime.fromisoformat(created_at)).days if created_at else 0
                 
                 # Get last login
                 last_login = account.get('last_login', 'Never')
                 if last_login != 'Never':
                     last_login_dt = datetime.fromisoformat(last_login)
                     last_login_str = last_login_dt.strftime('%Y-%m-%d %H:%M')
-                    days_since_login = (datetime.now() - last_login_dt).days
+                    days_since_login = (now - last_login_dt).days
                 else:
                     last_login_str = 'Never'
                     days_since_login = 'N/A'
@@ -3612,18 +3840,16 @@ def show_admin_panel():
                 response_count = 0
                 if has_data:
                     try:
-                        with open(user_data_file, 'r') as f:
-                            user_data = json.load(f)
-                            for session_data in user_data.get('responses', {}).values():
-                                response_count += len(session_data.get('questions', {}))
-                    except:
-                        pass
+                        user_data = load_json_file(user_data_file)
+                        response_count = sum(map(len, (session_data.get('questions', {}) for session_data in user_data.get('responses', {}).values())))
+                    except (OSError, ValueError, AttributeError) as e:
+                        logger.warning(f"Could not count responses for {user_id}: {e}")
                 
                 users.append({
                     "id": user_id,
                     "email": account.get('email', ''),
-                    "name": f"{account.get('profile', {}).get('first_name', '')} {account.get('profile', {}).get('last_name', '')}".strip(),
-                    "created": created.strftime('%Y-%m-%d'),
+                    "name": profile_display_name(account.get('profile')),
+                    "created": created_at[:10] if created_at else today_str,
                     "age_days": age_days,
                     "last_login": last_login_str,
                     "days_since_login": days_since_login,
@@ -3644,15 +3870,15 @@ def show_admin_panel():
     )
     
     if sort_by == "Created (newest)":
-        users.sort(key=lambda x: x['created'], reverse=True)
+        users.sort(key=itemgetter('created'), reverse=True)
     elif sort_by == "Created (oldest)":
-        users.sort(key=lambda x: x['created'])
+        users.sort(key=itemgetter('created'))
     elif sort_by == "Last Login":
         users.sort(key=lambda x: str(x['days_since_login']))
     elif sort_by == "Most Words":
-        users.sort(key=lambda x: x['total_words'], reverse=True)
+        users.sort(key=itemgetter('total_words'), reverse=True)
     elif sort_by == "Most Active":
-        users.sort(key=lambda x: x['response_count'], reverse=True)
+        users.sort(key=itemgetter('response_count'), reverse=True)
     elif sort_by == "Name":
         users.sort(key=lambda x: x['name'].lower())
     
@@ -3663,7 +3889,7 @@ def show_admin_panel():
         active_last_7 = sum(1 for u in users if u['days_since_login'] != 'N/A' and u['days_since_login'] <= 7)
         st.metric("Active (7 days)", active_last_7)
     with col2:
-        total_words_all = sum(u['total_words'] for u in users)
+        total_words_all = sum(map(itemgetter('total_words'), users))
         st.metric("Total Words", f"{total_words_all:,}")
     with col3:
         avg_words = total_words_all // len(users) if users else 0
@@ -3734,7 +3960,7 @@ def show_admin_panel():
                     "summary": {
                         "total_users": len(accounts_backup),
                         "total_words": sum(u.get("stats", {}).get("total_words", 0) for u in accounts_backup.values()),
-                        "total_sessions": sum(len(s) for s in sessions.values())
+                        "total_sessions": sum(map(len, sessions.values()))
                     }
                 }
                 
@@ -3784,8 +4010,7 @@ def show_admin_panel():
             if st.button("⚠️ CONFIRM RESTORE", type="primary", use_container_width=True):
                 with st.spinner("Restoring master backup... THIS WILL OVERWRITE ALL DATA!"):
                     try:
-                        backup_content = uploaded_backup.read().decode('utf-8')
-                        backup_data = json.loads(backup_content)
+                        backup_data = json_loads(uploaded_backup.getvalue())
                         
                         # 1. Restore accounts
                         accounts_dir = Path("accounts")
@@ -4225,7 +4450,7 @@ with st.sidebar:
     st.header("👤 Your Profile")
     if st.session_state.user_account:
         profile = st.session_state.user_account['profile']
-        st.success(f"✓ **{profile['first_name']} {profile['last_name']}**")
+        st.success(f"✓ **{profile_display_name(profile)}**")
     
     if st.button("📝 Complete Profile", key="complete_profile_btn", use_container_width=True): 
         st.session_state.show_profile_setup = True
@@ -4259,15 +4484,14 @@ with st.sidebar:
             st.success(f"Found {len(results)} matches")
             with st.expander(f"📖 {len(results)} Results", expanded=True):
                 for i, r in enumerate(results[:10]):
-                    st.markdown(f"**Session {r['session_id']}: {r['session_title']}**  \n*{r['question']}*")
-                    if r.get('has_images'):
-                        st.caption(f"📸 Contains {r.get('image_count', 1)} photo(s)")
-                    st.markdown(f"{r['answer'][:150]}...")
-                    if st.button(f"Go to Session", key=f"srch_go_{i}_{r['session_id']}", use_container_width=True):
-                        for idx, s in enumerate(SESSIONS):
-                            if s["id"] == r['session_id']:
-                                st.session_state.update(current_session=idx, current_question_override=r['question'], show_ai_rewrite_menu=False)
-                                st.rerun()
+                    st.markdown(f"**Session {r.session_id}: {r.session_title}**  \n*{r.question}*")
+                    if r.has_images:
+                        st.caption(f"📸 Contains {r.image_count} photo(s)")
+                    st.markdown(f"{r.answer[:150]}...")
+                    if st.button(f"Go to Session", key=f"srch_go_{i}_{r.session_id}", use_container_width=True):
+                        if r.session_id in SESSION_INDEX:
+                            st.session_state.update(current_session=SESSION_INDEX[r.session_id], current_question_override=r.question, show_ai_rewrite_menu=False)
+                            st.rerun()
                     st.divider()
                 if len(results) > 10: 
                     st.info(f"... and {len(results)-10} more matches")
@@ -4314,9 +4538,7 @@ with st.sidebar:
     if st.session_state.current_question_bank:
         for i, s in enumerate(st.session_state.current_question_bank):
             sid = s["id"]
-            sdata = st.session_state.responses.get(sid, {})
-            resp_cnt = len(sdata.get("questions", {}))
-            total_q = len(s["questions"])
+            resp_cnt, total_q = SESSION_COUNTS[sid]
             status = "🟢" if resp_cnt == total_q and total_q > 0 else "🟡" if resp_cnt > 0 else "🔴"
             if i == st.session_state.current_session: 
                 status = "▶️"
@@ -4364,65 +4586,51 @@ with st.sidebar:
     st.subheader("📤 Publish Your Book")
 
     if st.session_state.logged_in and st.session_state.user_id:
-        export_data = []
-        for session in SESSIONS:
-            sid = session["id"]
-            sdata = st.session_state.responses.get(sid, {})
-            for q, a in sdata.get("questions", {}).items():
-                images_with_data = []
-                if a.get("images"):
-                    for img_ref in a.get("images", []):
-                        img_id = img_ref.get("id")
-                        b64 = st.session_state.image_handler.get_image_base64(img_id) if st.session_state.image_handler else None
-                        caption = img_ref.get("caption", "")
-                        if b64:
-                            images_with_data.append({
-                                "id": img_id, "base64": b64, "caption": caption
-                            })
-                
-                export_item = {
-                    "question": q, 
-                    "answer_text": re.sub(r'<[^>]+>', '', a.get("answer", "")),
-                    "timestamp": a.get("timestamp", ""), 
-                    "session_id": sid, 
-                    "session_title": session["title"],
-                    "has_images": a.get("has_images", False), 
-                    "image_count": a.get("image_count", 0),
-                    "images": images_with_data
-                }
-                export_data.append(export_item)
+        export_data = get_export_data()
         
         if export_data:
-            complete_data = {
-                "user": st.session_state.user_id, 
-                "user_profile": st.session_state.user_account.get('profile', {}),
-                "narrative_gps": st.session_state.user_account.get('narrative_gps', {}),
-                "enhanced_profile": st.session_state.user_account.get('enhanced_profile', {}),
-                "cover_design": st.session_state.user_account.get('cover_design', {}),
-                "stories": export_data, 
-                "export_date": datetime.now().isoformat(),
-                "summary": {
-                    "total_stories": len(export_data), 
-                    "total_sessions": len(set(s['session_id'] for s in export_data))
-                }
-            }
+            # The backup payload, its temp file and its encoded bytes only change
+            # when the stories or the profile sections change, so reuse them otherwise.
+            account = st.session_state.user_account
+            account_sections = [account.get(k, {}) for k in ('profile', 'narrative_gps', 'enhanced_profile', 'cover_design')]
+            backup_key = (st.session_state._export_fp, json.dumps(account_sections, sort_keys=True, default=str))
+            cached_backup = st.session_state.get("_export_backup")
             
-            temp_file = f"temp_export_{st.session_state.user_id}.json"
-            with open(temp_file, 'w') as f:
-                json.dump(complete_data, f)
+            if cached_backup and cached_backup[0] == backup_key:
+                complete_data, json_bytes = cached_backup[1], cached_backup[2]
+            else:
+                complete_data = {
+                    "user": st.session_state.user_id, 
+                    "user_profile": account_sections[0],
+                    "narrative_gps": account_sections[1],
+                    "enhanced_profile": account_sections[2],
+                    "cover_design": account_sections[3],
+                    "stories": export_data, 
+                    "export_date": datetime.now().isoformat(),
+                    "summary": {
+                        "total_stories": len(export_data), 
+                        "total_sessions": len(set(s['session_id'] for s in export_data))
+                    }
+                }
+                
+                temp_file = f"temp_export_{st.session_state.user_id}.json"
+                with open(temp_file, 'w') as f:
+                    json.dump(complete_data, f)
+                
+                json_bytes = json.dumps(complete_data, indent=2).encode('utf-8')
+                st.session_state._export_backup = (backup_key, complete_data, json_bytes)
+                st.session_state.publisher_data_path = temp_file
             
             st.session_state.publisher_data = complete_data
-            st.session_state.publisher_data_path = temp_file
             
             if st.button("📚 Open Book Publisher", key="open_publisher_btn", type="primary", use_container_width=True):
                 st.session_state.show_publisher = True
                 st.rerun()
             
             with st.expander("📦 JSON Backup", expanded=False):
-                json_data = json.dumps(complete_data, indent=2)
                 st.download_button(
                     label="📥 Download JSON Backup", 
-                    data=json_data,
+                    data=json_bytes,
                     file_name=f"Tell_My_Story_Backup_{st.session_state.user_id}.json",
                     mime="application/json", 
                     use_container_width=True,
@@ -4469,25 +4677,25 @@ with st.sidebar:
 # ============================================================================
 # PUBLISHER FUNCTIONS - COMPLETE
 # ============================================================================
-def clean_text_for_export(text):
-    """Clean text for export - remove HTML tags but preserve structure"""
-    if not text:
-        return ""
-    
-    try:
-        text = text.replace('&nbsp;', ' ')
-        text = text.replace('&amp;', '&')
-        text = text.replace('&lt;', '<')
-        text = text.replace('&gt;', '>')
-        text = text.replace('&quot;', '"')
-        text = text.replace('&#39;', "'")
-        
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        return text.strip()
-    except Exception as e:
-        logger.error(f"Error cleaning text for export: {e}")
-        return ""
+_ANCHOR_TRANS = str.maketrans({' ': '-', '?': None, '!': None, ',': None, '.': None})
+_FILENAME_TRANS = str.maketrans(dict.fromkeys(' /\\:*?"<>|', '_'))
+
+def group_stories_by_session(stories):
+    """Group export stories by session title, keeping first-seen session order."""
+    sessions = {}
+    for story in stories:
+        sessions.setdefault(story.get('session_title', 'Untitled Session'), []).append(story)
+    return sessions
+
+def decode_image_base64(img_b64):
+    """Decode stored image base64 to bytes, tolerating a ``data:...;base64,`` prefix.
+
+    The payload came from our own encoder, so the non-validating decoder is used
+    and the bytes go straight to the caller without a text round-trip.
+    """
+    if img_b64.startswith('data:'):
+        img_b64 = img_b64.partition(',')[2]
+    return base64.b64decode(img_b64, validate=False)
 
 def generate_docx_book(title, author, stories, format_style="interview", include_toc=True, include_images=True, cover_image=None, cover_choice="simple"):
     """Generate a Word document"""
@@ -4516,7 +4724,7 @@ def generate_docx_book(title, author, stories, format_style="interview", include
                 p.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 r = p.add_run()
                 r.add_picture(image_stream, width=Inches(5))
-            except:
+            except Exception:
                 p = doc.add_paragraph()
                 p.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 run = p.add_run(title)
@@ -4548,6 +4756,9 @@ def generate_docx_book(title, author, stories, format_style="interview", include
         p.add_run(f"© {datetime.now().year} {author}. All rights reserved.")
         doc.add_page_break()
         
+        sessions = group_stories_by_session(stories)
+        interview = format_style == "interview"
+        
         if include_toc:
             p = doc.add_paragraph()
             p.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -4556,71 +4767,62 @@ def generate_docx_book(title, author, stories, format_style="interview", include
             run.font.bold = True
             p.paragraph_format.space_after = Pt(12)
             
-            sessions = {}
-            for story in stories:
-                session_title = story.get('session_title', 'Untitled Session')
-                if session_title not in sessions:
-                    sessions[session_title] = []
-            
-            for session_title in sessions.keys():
+            for session_title in sessions:
                 p = doc.add_paragraph(f"• {session_title}")
                 p.paragraph_format.left_indent = Inches(0.5)
             
             doc.add_page_break()
         
-        current_session = None
-        for story in stories:
-            session_title = story.get('session_title', 'Untitled Session')
-            
-            if session_title != current_session:
-                current_session = session_title
-                p = doc.add_paragraph()
-                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                run = p.add_run(session_title)
-                run.font.size = Pt(16)
-                run.font.bold = True
-                p.paragraph_format.space_before = Pt(12)
-                p.paragraph_format.space_after = Pt(6)
+        for session_title, session_stories in sessions.items():
+            p = doc.add_paragraph()
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            run = p.add_run(session_title)
+            run.font.size = Pt(16)
+            run.font.bold = True
+            p.paragraph_format.space_before = Pt(12)
+            p.paragraph_format.space_after = Pt(6)
             
-            if format_style == "interview":
-                question_text = clean_text_for_export(story.get('question', ''))
-                p = doc.add_paragraph(question_text)
-                p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                p.runs[0].bold = True
-                p.runs[0].italic = True
+            for story in session_stories:
+                if interview:
+                    question_text = clean_text_for_export(story.get('question', ''))
+                    p = doc.add_paragraph(question_text)
+                    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                    p.runs[0].bold = True
+                    p.runs[0].italic = True
             
-            answer_text = clean_text_for_export(story.get('answer_text', ''))
-            if answer_text:
-                paragraphs = answer_text.split('\n')
-                for para in paragraphs:
-                    if para.strip():
-                        p = doc.add_paragraph(para.strip())
-                        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                        p.paragraph_format.first_line_indent = Inches(0.25)
+                answer_text = clean_text_for_export(story.get('answer_text', ''))
+                if answer_text:
+                    for line in answer_text.splitlines():
+                        if para := line.strip():
+                            p = doc.add_paragraph(para)
+                            p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                            p.paragraph_format.first_line_indent = Inches(0.25)
             
-            if include_images and story.get('images'):
-                for img in story.get('images', []):
-                    if img.get('base64'):
-                        try:
-                            img_data = base64.b64decode(img['base64'])
-                            img_stream = io.BytesIO(img_data)
-                            
-                            p = doc.add_paragraph()
-                            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            run = p.add_run()
-                            run.add_picture(img_stream, width=Inches(4))
+                if include_images and (images := story.get('images')):
+                    for img in images:
+                        img_b64 = img.get('base64')
+                        if img_b64:
+                            try:
+                                img_data = decode_image_base64(img_b64)
+                                img_stream = io.BytesIO(img_data)
                             
-                            if img.get('caption'):
-                                caption = clean_text_for_export(img['caption'])
-                                p = doc.add_paragraph(caption)
+                                p = doc.add_paragraph()
                                 p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                p.runs[0].font.size = Pt(10)
-                                p.runs[0].font.italic = True
-                        except Exception as e:
-                            logger.error(f"Error adding image to DOCX: {e}")
-                            continue
+                                run = p.add_run()
+                                run.add_picture(img_stream, width=Inches(4))
+                            
+                                img_caption = img.get('caption')
+                                if img_caption:
+                                    caption = clean_text_for_export(img_caption)
+                                    p = doc.add_paragraph(caption)
+                                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                                    p.runs[0].font.size = Pt(10)
+                                    p.runs[0].font.italic = True
+                            except Exception as e:
+                                logger.error(f"Error adding image to DOCX: {e}")
+                                continue
             
-            doc.add_paragraph()
+                doc.add_paragraph()
         
         docx_bytes = io.BytesIO()
         doc.save(docx_bytes)
@@ -4637,276 +4839,278 @@ def generate_docx_book(title, author, stories, format_style="interview", include
         st.error(f"Error generating DOCX: {e}")
         return None
 
-def generate_html_book(title, author, stories, format_style="interview", include_toc=True, include_images=True, cover_image=None, cover_choice="simple"):
-    """Generate an HTML document from stories"""
-    try:
-        html_parts = []
-        
-        html_parts.append(f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>{html.escape(title)}</title>
-            <style>
-                body {{
-                    font-family: 'Georgia', serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 800px;
-                    margin: 0 auto;
-                    padding: 40px 20px;
-                    background: #fff;
-                }}
-                h1 {{
-                    font-size: 42px;
-                    text-align: center;
-                    margin-bottom: 10px;
-                    color: #000;
-                    font-weight: bold;
-                }}
-                h2 {{
-                    font-size: 28px;
-                    text-align: center;
-                    margin-top: 40px;
-                    margin-bottom: 20px;
-                    color: #444;
-                    border-bottom: 2px solid #eee;
-                    padding-bottom: 10px;
-                    font-weight: bold;
-                }}
-                .author {{
-                    text-align: center;
-                    font-size: 24px;
-                    color: #666;
-                    margin-bottom: 40px;
-                    font-style: italic;
-                }}
-                .question {{
-                    font-weight: bold;
-                    font-size: 18px;
-                    margin-top: 30px;
-                    margin-bottom: 10px;
-                    color: #2c3e50;
-                    border-left: 4px solid #3498db;
-                    padding-left: 15px;
-                    text-align: left;
-                }}
-                .answer {{
-                    text-align: left;
-                    margin-bottom: 20px;
-                }}
-                .answer p {{
-                    text-indent: 0.5in;
-                    margin-bottom: 6px;
-                    text-align: left;
-                    line-height: 1.8;
-                }}
-                .story-image {{
-                    max-width: 100%;
-                    height: auto;
-                    display: block;
-                    margin: 20px auto;
-                    border-radius: 5px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }}
-                .image-caption {{
-                    text-align: center;
-                    font-size: 14px;
-                    color: #666;
-                    margin-top: 5px;
-                    margin-bottom: 20px;
-                    font-style: italic;
-                }}
-                .cover-page {{
-                    text-align: center;
-                    margin-bottom: 50px;
-                    page-break-after: always;
-                    min-height: 90vh;
-                    display: flex;
-                    flex-direction: column;
-                    justify-content: center;
-                }}
-                .cover-image {{
-                    max-width: 100%;
-                    max-height: 70vh;
-                    object-fit: contain;
-                    margin: 20px auto;
-                    border-radius: 10px;
-                    box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-                }}
-                .simple-cover {{
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    padding: 60px 20px;
-                    border-radius: 10px;
-                    color: white;
-                    margin: 20px;
-                    text-align: center;
-                }}
-                .simple-cover h1 {{
-                    color: white;
-                    text-align: center;
-                    text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-                }}
-                .simple-cover .author {{
-                    color: rgba(255,255,255,0.9);
-                    text-align: center;
-                }}
-                .copyright {{
-                    text-align: center;
-                    font-size: 12px;
-                    color: #999;
-                    margin-top: 50px;
-                    padding-top: 20px;
-                    border-top: 1px solid #eee;
-                }}
-                .toc {{
-                    background: #f9f9f9;
-                    padding: 20px;
-                    border-radius: 5px;
-                    margin: 30px 0;
-                    text-align: left;
-                }}
-                .toc h3 {{
-                    text-align: center;
-                    margin-top: 0;
-                }}
-                .toc ul {{
-                    list-style-type: none;
-                    padding-left: 0;
-                }}
-                .toc li {{
-                    margin-bottom: 10px;
-                    text-align: left;
-                    font-size: 16px;
-                }}
-                .toc a {{
-                    color: #3498db;
-                    text-decoration: none;
-                }}
-                .toc a:hover {{
-                    text-decoration: underline;
-                }}
-                hr {{
-                    margin: 30px 0;
-                    border: none;
-                    border-top: 1px dashed #ccc;
-                }}
-                @media print {{
-                    body {{
-                        padding: 0.5in;
-                    }}
-                    .cover-page {{
-                        page-break-after: always;
-                        min-height: auto;
-                    }}
-                    h2 {{
-                        page-break-before: always;
-                    }}
-                }}
-            </style>
-        </head>
-        <body>
-        """)
-        
-        html_parts.append('<div class="cover-page">')
-        
-        if cover_choice == "uploaded" and cover_image:
-            try:
-                img_base64 = base64.b64encode(cover_image).decode()
-                html_parts.append(f'''
-                <div>
-                    <img src="data:image/jpeg;base64,{img_base64}" class="cover-image" alt="Book Cover">
-                    <h1>{html.escape(title)}</h1>
-                    <p class="author">by {html.escape(author)}</p>
-                </div>
-                ''')
-            except Exception:
-                html_parts.append(f'''
-                <div class="simple-cover">
-                    <h1>{html.escape(title)}</h1>
-                    <p class="author">by {html.escape(author)}</p>
-                </div>
-                ''')
-        else:
-            html_parts.append(f'''
+_HTML_BOOK_CSS = """
+    <style>
+        body {
+            font-family: 'Georgia', serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 40px 20px;
+            background: #fff;
+        }
+        h1 {
+            font-size: 42px;
+            text-align: center;
+            margin-bottom: 10px;
+            color: #000;
+            font-weight: bold;
+        }
+        h2 {
+            font-size: 28px;
+            text-align: center;
+            margin-top: 40px;
+            margin-bottom: 20px;
+            color: #444;
+            border-bottom: 2px solid #eee;
+            padding-bottom: 10px;
+            font-weight: bold;
+        }
+        .author {
+            text-align: center;
+            font-size: 24px;
+            color: #666;
+            margin-bottom: 40px;
+            font-style: italic;
+        }
+        .question {
+            font-weight: bold;
+            font-size: 18px;
+            margin-top: 30px;
+            margin-bottom: 10px;
+            color: #2c3e50;
+            border-left: 4px solid #3498db;
+            padding-left: 15px;
+            text-align: left;
+        }
+        .answer {
+            text-align: left;
+            margin-bottom: 20px;
+        }
+        .answer p {
+            text-indent: 0.5in;
+            margin-bottom: 6px;
+            text-align: left;
+            line-height: 1.8;
+        }
+        .story-image {
+            max-width: 100%;
+            height: auto;
+            display: block;
+            margin: 20px auto;
+            border-radius: 5px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        .image-caption {
+            text-align: center;
+            font-size: 14px;
+            color: #666;
+            margin-top: 5px;
+            margin-bottom: 20px;
+            font-style: italic;
+        }
+        .cover-page {
+            text-align: center;
+            margin-bottom: 50px;
+            page-break-after: always;
+            min-height: 90vh;
+            display: flex;
+            flex-direction: column;
+            justify-content: center;
+        }
+        .cover-image {
+            max-width: 100%;
+            max-height: 70vh;
+            object-fit: contain;
+            margin: 20px auto;
+            border-radius: 10px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+        }
+        .simple-cover {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            padding: 60px 20px;
+            border-radius: 10px;
+            color: white;
+            margin: 20px;
+            text-align: center;
+        }
+        .simple-cover h1 {
+            color: white;
+            text-align: center;
+            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
+        }
+        .simple-cover .author {
+            color: rgba(255,255,255,0.9);
+            text-align: center;
+        }
+        .copyright {
+            text-align: center;
+            font-size: 12px;
+            color: #999;
+            margin-top: 50px;
+            padding-top: 20px;
+            border-top: 1px solid #eee;
+        }
+        .toc {
+            background: #f9f9f9;
+            padding: 20px;
+            border-radius: 5px;
+            margin: 30px 0;
+            text-align: left;
+        }
+        .toc h3 {
+            text-align: center;
+            margin-top: 0;
+        }
+        .toc ul {
+            list-style-type: none;
+            padding-left: 0;
+        }
+        .toc li {
+            margin-bottom: 10px;
+            text-align: left;
+            font-size: 16px;
+        }
+        .toc a {
+            color: #3498db;
+            text-decoration: none;
+        }
+        .toc a:hover {
+            text-decoration: underline;
+        }
+        hr {
+            margin: 30px 0;
+            border: none;
+            border-top: 1px dashed #ccc;
+        }
+        @media print {
+            body {
+                padding: 0.5in;
+            }
+            .cover-page {
+                page-break-after: always;
+                min-height: auto;
+            }
+            h2 {
+                page-break-before: always;
+            }
+        }
+    </style>
+"""
+
+_HTML_STORY_IMAGE = '<img src="{src}" class="story-image" alt="{alt}">'
+_HTML_IMAGE_CAPTION = '<p class="image-caption">{}</p>'
+
+def write_html_book(out, title, author, stories, format_style="interview", include_toc=True, include_images=True, cover_image=None, cover_choice="simple"):
+    """Write an HTML book into the text file-like object `out` fragment by fragment, instead of concatenating one string"""
+    def emit(part):
+        out.write(part)
+        out.write('\n')
+    
+    emit(f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{html.escape(title)}</title>""")
+    emit(_HTML_BOOK_CSS)
+    emit("""
+    </head>
+    <body>
+    """)
+    
+    emit('<div class="cover-page">')
+    
+    if cover_choice == "uploaded" and cover_image:
+        try:
+            img_base64 = base64.b64encode(cover_image).decode()
+            emit(f'''
+            <div>
+                <img src="data:image/jpeg;base64,{img_base64}" class="cover-image" alt="Book Cover">
+                <h1>{html.escape(title)}</h1>
+                <p class="author">by {html.escape(author)}</p>
+            </div>
+            ''')
+        except Exception:
+            emit(f'''
             <div class="simple-cover">
                 <h1>{html.escape(title)}</h1>
                 <p class="author">by {html.escape(author)}</p>
             </div>
             ''')
+    else:
+        emit(f'''
+        <div class="simple-cover">
+            <h1>{html.escape(title)}</h1>
+            <p class="author">by {html.escape(author)}</p>
+        </div>
+        ''')
+    
+    emit('</div>')
+    
+    emit(f'<p class="copyright">© {datetime.now().year} {html.escape(author)}. All rights reserved.</p>')
+    
+    sessions = group_stories_by_session(stories)
+    interview = format_style == "interview"
+    anchors = {t: t.lower().translate(_ANCHOR_TRANS) for t in sessions}
+    
+    if include_toc:
+        emit('<div class="toc">')
+        emit('<h3>Table of Contents</h3>')
+        emit('<ul>')
+        emit('\n'.join(
+            f'<li><a href="#{anchor}">{html.escape(session_title)}</a></li>'
+            for session_title, anchor in anchors.items()
+        ))
+        emit('</ul>')
+        emit('</div>')
+    
+    for session_title, session_stories in sessions.items():
+        emit(f'<h2 id="{anchors[session_title]}">{html.escape(session_title)}</h2>')
         
-        html_parts.append('</div>')
-        
-        html_parts.append(f'<p class="copyright">© {datetime.now().year} {html.escape(author)}. All rights reserved.</p>')
-        
-        if include_toc:
-            html_parts.append('<div class="toc">')
-            html_parts.append('<h3>Table of Contents</h3>')
-            html_parts.append('<ul>')
-            
-            sessions = {}
-            for story in stories:
-                session_title = story.get('session_title', 'Untitled Session')
-                if session_title not in sessions:
-                    sessions[session_title] = []
-                sessions[session_title].append(story)
-            
-            for session_title in sessions.keys():
-                anchor = session_title.lower().replace(' ', '-').replace('?', '').replace('!', '').replace(',', '').replace('.', '')
-                html_parts.append(f'<li><a href="#{anchor}">{html.escape(session_title)}</a></li>')
-            
-            html_parts.append('</ul>')
-            html_parts.append('</div>')
-        
-        current_session = None
-        for story in stories:
-            session_title = story.get('session_title', 'Untitled Session')
-            anchor = session_title.lower().replace(' ', '-').replace('?', '').replace('!', '').replace(',', '').replace('.', '')
-            
-            if session_title != current_session:
-                current_session = session_title
-                html_parts.append(f'<h2 id="{anchor}">{html.escape(session_title)}</h2>')
-            
-            if format_style == "interview":
+        for story in session_stories:
+            if interview:
                 question_text = story.get('question', '')
                 clean_question = clean_text_for_export(question_text)
-                html_parts.append(f'<div class="question">{html.escape(clean_question)}</div>')
-            
+                emit(f'<div class="question">{html.escape(clean_question)}</div>')
+        
             answer_text = story.get('answer_text', '')
             if answer_text:
                 clean_answer = clean_text_for_export(answer_text)
-                
-                html_parts.append('<div class="answer">')
-                paragraphs = clean_answer.split('\n')
-                for para in paragraphs:
-                    if para.strip():
-                        escaped_para = html.escape(para.strip())
-                        html_parts.append(f'<p>{escaped_para}</p>')
-                html_parts.append('</div>')
             
-            if include_images and story.get('images'):
-                for img in story.get('images', []):
-                    if img.get('base64'):
-                        img_data = img['base64']
+                emit('<div class="answer">')
+                emit('\n'.join(
+                    f'<p>{html.escape(para)}</p>'
+                    for line in clean_answer.splitlines() if (para := line.strip())
+                ))
+                emit('</div>')
+        
+            if include_images and (images := story.get('images')):
+                for img in images:
+                    img_data = img.get('base64')
+                    if img_data:
                         if not img_data.startswith('data:image'):
-                            html_parts.append(f'<img src="data:image/jpeg;base64,{img_data}" class="story-image" alt="Story image">')
-                        else:
-                            html_parts.append(f'<img src="{img_data}" class="story-image" alt="Story image">')
-                        
-                        if img.get('caption'):
-                            clean_caption = clean_text_for_export(img['caption'])
-                            caption = html.escape(clean_caption)
-                            html_parts.append(f'<p class="image-caption">{caption}</p>')
-            
-            html_parts.append('<hr>')
-        
-        html_parts.append("""
-        </body>
-        </html>
-        """)
+                            img_data = 'data:image/jpeg;base64,' + img_data
+                        img_caption = img.get('caption')
+                        caption = html.escape(clean_text_for_export(img_caption)) if img_caption else ''
+                        emit(_HTML_STORY_IMAGE.format(src=img_data, alt=caption or 'Story image'))
+                        if caption:
+                            emit(_HTML_IMAGE_CAPTION.format(caption))
         
-        return '\n'.join(html_parts)
+            emit('<hr>')
+    
+    emit("""
+    </body>
+    </html>
+    """)
+
+def generate_html_book(title, author, stories, format_style="interview", include_toc=True, include_images=True, cover_image=None, cover_choice="simple"):
+    """Generate an HTML document from stories"""
+    try:
+        buffer = io.StringIO()
+        write_html_book(buffer, title, author, stories, format_style, include_toc, include_images, cover_image, cover_choice)
+        return buffer.getvalue()
         
     except Exception as e:
         logger.error(f"Error generating HTML: {e}")
@@ -4952,62 +5156,55 @@ def generate_epub_book(title, author, stories, format_style="interview", include
         nav_css = epub.EpubItem(uid="style_nav", file_name="style/nav.css", media_type="text/css", content=style)
         book.add_item(nav_css)
         
-        chapters = []
-        current_session = None
-        chapter_index = 1
+        sessions = group_stories_by_session(stories)
+        interview = format_style == "interview"
         
-        for story in stories:
-            session_title = story.get('session_title', 'Untitled Session')
+        chapters = []
+        for chapter_index, (session_title, session_stories) in enumerate(sessions.items(), 1):
+            chapter = epub.EpubHtml(
+                title=session_title,
+                file_name=f'chap_{chapter_index:02d}.xhtml',
+                lang='en'
+            )
+            chapter.add_item(nav_css)
             
-            if session_title != current_session:
-                current_session = session_title
-                
-                chapter = epub.EpubHtml(
-                    title=session_title,
-                    file_name=f'chap_{chapter_index:02d}.xhtml',
-                    lang='en'
-                )
-                chapter.add_item(nav_css)
-                
-                content = [f'<h1 class="session-header">{html.escape(session_title)}</h1>']
-                
-                session_stories = [s for s in stories if s.get('session_title') == session_title]
+            content = [f'<h1 class="session-header">{html.escape(session_title)}</h1>']
+            
+            for s in session_stories:
+                if interview:
+                    question = clean_text_for_export(s.get('question', ''))
+                    content.append(f'<p class="question">{html.escape(question)}</p>')
                 
-                for s in session_stories:
-                    if format_style == "interview":
-                        question = clean_text_for_export(s.get('question', ''))
-                        content.append(f'<p class="question">{html.escape(question)}</p>')
-                    
-                    answer = clean_text_for_export(s.get('answer_text', ''))
-                    if answer:
-                        content.append('<div class="answer">')
-                        paragraphs = answer.split('\n')
-                        for para in paragraphs:
-                            if para.strip():
-                                content.append(f'<p>{html.escape(para.strip())}</p>')
-                        content.append('</div>')
-                    
-                    if include_images and s.get('images'):
-                        for img in s.get('images', []):
-                            if img.get('base64'):
-                                img_data = base64.b64decode(img['base64'])
-                                img_file = f"img_{chapter_index}_{img.get('id', 'unknown')}.jpg"
-                                img_item = epub.EpubImage()
-                                img_item.file_name = f"images/{img_file}"
-                                img_item.media_type = "image/jpeg"
-                                img_item.content = img_data
-                                book.add_item(img_item)
-                                
-                                content.append(f'<img src="images/{img_file}" style="max-width:100%; display:block; margin:20px auto;"/>')
-                                
-                                if img.get('caption'):
-                                    caption = clean_text_for_export(img['caption'])
-                                    content.append(f'<p class="image-caption">{html.escape(caption)}</p>')
+                answer = clean_text_for_export(s.get('answer_text', ''))
+                if answer:
+                    content.append('<div class="answer">')
+                    for line in answer.splitlines():
+                        if para := line.strip():
+                            content.append(f'<p>{html.escape(para)}</p>')
+                    content.append('</div>')
                 
-                chapter.content = '\n'.join(content)
-                book.add_item(chapter)
-                chapters.append(chapter)
-                chapter_index += 1
+                if include_images and (images := s.get('images')):
+                    for img in images:
+                        img_b64 = img.get('base64')
+                        if img_b64:
+                            img_data = decode_image_base64(img_b64)
+                            img_file = f"img_{chapter_index}_{img.get('id', 'unknown')}.jpg"
+                            img_item = epub.EpubImage()
+                            img_item.file_name = f"images/{img_file}"
+                            img_item.media_type = "image/jpeg"
+                            img_item.content = img_data
+                            book.add_item(img_item)
+                            
+                            content.append(f'<img src="images/{img_file}" style="max-width:100%; display:block; margin:20px auto;"/>')
+                            
+                            img_caption = img.get('caption')
+                            if img_caption:
+                                caption = clean_text_for_export(img_caption)
+                                content.append(f'<p class="image-caption">{html.escape(caption)}</p>')
+            
+            chapter.content = '\n'.join(content)
+            book.add_item(chapter)
+            chapters.append(chapter)
         
         book.toc = chapters
         
@@ -5028,46 +5225,49 @@ def generate_epub_book(title, author, stories, format_style="interview", include
         logger.error(f"Error generating EPUB: {e}")
         return None, f"Error generating EPUB: {e}"
 
+_RTF_TOC_ENTRY = r"\pard\ql\fs28 {}\par"
+_RTF_CHAPTER_HEADING = r"\pard\qc\fs40\b {}\par\par"
+_RTF_QUESTION = r"\pard\ql\fs28\b\i {}\par"
+_RTF_PARAGRAPH = r"\pard\ql\fs24\fi360 {}\par"
+
 def generate_rtf_book(title, author, stories, format_style="interview", include_toc=True, include_images=True, cover_image=None, cover_choice="simple"):
     """Generate an RTF file"""
     try:
-        rtf = r"""{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}
+        year = datetime.now().year
+        rtf = io.StringIO()
+        rtf.write(r"""{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}
 \paperw12240\paperh15840\margl1440\margr1440\margt1440\margb1440
-"""
-        rtf += r"\pard\qc\fs72\b " + title + r"\par\par"
-        rtf += r"\pard\qc\fs48\i by " + author + r"\par\par"
-        rtf += r"\pard\qc\fs24\i Copyright " + str(datetime.now().year) + r" " + author + r". All rights reserved.\par\par"
+""")
+        rtf.write(
+            rf"\pard\qc\fs72\b {title}\par\par"
+            rf"\pard\qc\fs48\i by {author}\par\par"
+            rf"\pard\qc\fs24\i Copyright {year} {author}. All rights reserved.\par\par"
+        )
         
-        sessions = {}
-        for story in stories:
-            session_title = story.get('session_title', '')
-            if session_title not in sessions:
-                sessions[session_title] = []
-            sessions[session_title].append(story)
+        sessions = group_stories_by_session(stories)
+        interview = format_style == "interview"
         
         if include_toc:
-            rtf += r"\pard\qc\fs36\b Table of Contents\par\par"
-            for session_title in sessions.keys():
-                rtf += r"\pard\ql\fs28 " + session_title + r"\par"
-            rtf += r"\par"
+            rtf.write(r"\pard\qc\fs36\b Table of Contents\par\par")
+            rtf.write("".join(map(_RTF_TOC_ENTRY.format, sessions)))
+            rtf.write(r"\par")
         
         for session_title, session_stories in sessions.items():
-            rtf += r"\pard\qc\fs40\b " + session_title + r"\par\par"
+            rtf.write(_RTF_CHAPTER_HEADING.format(session_title))
             
             for story in session_stories:
-                if format_style == "interview":
+                if interview:
                     question = clean_text_for_export(story.get('question', ''))
-                    rtf += r"\pard\ql\fs28\b\i " + question + r"\par"
+                    rtf.write(_RTF_QUESTION.format(question))
                 
                 answer = clean_text_for_export(story.get('answer_text', ''))
-                paragraphs = answer.split('\n')
-                for para in paragraphs:
-                    if para.strip():
-                        rtf += r"\pard\ql\fs24\fi360 " + para.strip() + r"\par"
-                rtf += r"\par"
+                for line in answer.splitlines():
+                    if para := line.strip():
+                        rtf.write(_RTF_PARAGRAPH.format(para))
+                rtf.write(r"\par")
         
-        rtf += "}"
-        return rtf.encode('utf-8')
+        rtf.write("}")
+        return rtf.getvalue().encode('utf-8')
         
     except Exception as e:
         logger.error(f"Error generating RTF: {e}")
@@ -5079,6 +5279,129 @@ def show_celebration():
     st.balloons()
     st.success("🎉 Your book has been generated successfully!")
 
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@_fragment
+def render_book_downloads(book_title, book_author, stories_for_export, format_style, include_toc, cover_image_data, cover_choice, file_stem):
+    """Generate buttons and download links for the four book formats.
+
+    Runs as a fragment where Streamlit supports it, so pressing a generate or
+    download button reruns only this panel instead of the whole publisher page.
+    """
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        if st.button("📊 DOCX", key="generate_docx_btn", type="primary", use_container_width=True):
+            with st.spinner("Creating Word document..."):
+                docx_bytes = generate_docx_book(
+                    book_title,
+                    book_author,
+                    stories_for_export,
+                    format_style,
+                    include_toc,
+                    True,
+                    cover_image_data,
+                    cover_choice
+                )
+
+                if docx_bytes:
+                    filename = f"{file_stem}.docx"
+
+                    st.download_button(
+                        "📥 Download DOCX", 
+                        data=docx_bytes, 
+                        file_name=filename, 
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
+                        use_container_width=True,
+                        key="docx_download_btn"
+                    )
+                    show_celebration()
+
+    with col2:
+        if st.button("🌐 HTML", key="generate_html_btn", type="primary", use_container_width=True):
+            with st.spinner("Creating HTML page..."):
+                html_content = generate_html_book(
+                    book_title,
+                    book_author,
+                    stories_for_export,
+                    format_style,
+                    include_toc,
+                    True,
+                    cover_image_data,
+                    cover_choice
+                )
+
+                if html_content:
+                    filename = f"{file_stem}.html"
+
+                    st.download_button(
+                        "📥 Download HTML", 
+                        data=html_content, 
+                        file_name=filename, 
+                        mime="text/html", 
+                        use_container_width=True,
+                        key="html_download_btn"
+                    )
+                    show_celebration()
+
+    with col3:
+        if st.button("📱 EPUB", key="generate_epub_btn", type="primary", use_container_width=True):
+            with st.spinner("Creating EPUB file..."):
+                epub_bytes, error = generate_epub_book(
+                    book_title,
+                    book_author,
+                    stories_for_export,
+                    format_style,
+                    include_toc,
+                    True,
+                    cover_image_data,
+                    cover_choice
+                )
+
+                if epub_bytes:
+                    filename = f"{file_stem}.epub"
+                    st.download_button(
+                        "📥 Download EPUB", 
+                        data=epub_bytes, 
+                        file_name=filename, 
+                        mime="application/epub+zip", 
+                        use_container_width=True,
+                        key="epub_download_btn"
+                    )
+                    show_celebration()
+                else:
+                    st.error(f"Failed to generate EPUB: {error}")
+                    st.info("💡 Install ebooklib: pip install ebooklib")
+
+    with col4:
+        if st.button("📝 RTF", key="generate_rtf_btn", type="primary", use_container_width=True):
+            with st.spinner("Creating RTF file..."):
+                rtf_bytes = generate_rtf_book(
+                    book_title,
+                    book_author,
+                    stories_for_export,
+                    format_style,
+                    include_toc,
+                    True,
+                    cover_image_data,
+                    cover_choice
+                )
+
+                if rtf_bytes:
+                    filename = f"{file_stem}.rtf"
+                    st.download_button(
+                        "📥 Download RTF", 
+                        data=rtf_bytes, 
+                        file_name=filename, 
+                        mime="application/rtf", 
+                        use_container_width=True,
+                        key="rtf_download_btn"
+                    )
+                    show_celebration()
+                else:
+                    st.error("Failed to generate RTF")
+
+
 # ============================================================================
 # PUBLISHER PAGE - SHOW ON MAIN SCREEN WHEN ACTIVATED
 # ============================================================================
@@ -5103,37 +5426,10 @@ if st.session_state.get('show_publisher', False):
         </div>
         """, unsafe_allow_html=True)
     
-    stories_for_export = []
-    
     if st.session_state.logged_in and st.session_state.user_id:
-        for session in SESSIONS:
-            sid = session["id"]
-            sdata = st.session_state.responses.get(sid, {})
-            
-            for question_text, answer_data in sdata.get("questions", {}).items():
-                images_with_data = []
-                if answer_data.get("images") and st.session_state.image_handler:
-                    for img_ref in answer_data.get("images", []):
-                        img_id = img_ref.get("id")
-                        b64 = st.session_state.image_handler.get_image_base64(img_id) if st.session_state.image_handler else None
-                        if b64:
-                            images_with_data.append({
-                                "id": img_id,
-                                "base64": b64,
-                                "caption": img_ref.get("caption", "")
-                            })
-                
-                story_item = {
-                    "question": question_text,
-                    "answer_text": answer_data.get("answer", ""),
-                    "timestamp": answer_data.get("timestamp", ""),
-                    "session_id": sid,
-                    "session_title": session["title"],
-                    "has_images": answer_data.get("has_images", False),
-                    "image_count": answer_data.get("image_count", 0),
-                    "images": images_with_data
-                }
-                stories_for_export.append(story_item)
+        # Same cached export list the sidebar builds, so opening the publisher
+        # does not re-read and re-encode every image
+        stories_for_export = get_export_data()
         
         if stories_for_export:
             col1, col2 = st.columns(2)
@@ -5142,8 +5438,8 @@ if st.session_state.get('show_publisher', False):
                 default_title = f"{profile.get('first_name', 'My')}'s Story"
                 book_title = st.text_input("Book Title", value=default_title, key="publisher_title_input")
             with col2:
-                default_author = f"{profile.get('first_name', '')} {profile.get('last_name', '')}".strip()
-                book_author = st.text_input("Author Name", value=default_author if default_author else "Author Name", 
+                default_author = profile_display_name(profile, "Author Name")
+                book_author = st.text_input("Author Name", value=default_author, 
                                            key="publisher_author_input")
             
             st.markdown("---")
@@ -5183,21 +5479,30 @@ if st.session_state.get('show_publisher', False):
                     key="publisher_cover_upload"
                 )
                 if uploaded_cover:
-                    st.image(uploaded_cover, width=200, caption="Your cover image")
+                    cover_preview = get_upload_preview(uploaded_cover, "publisher_cover")
+                    if cover_preview:
+                        st.image(cover_preview, width=200, caption="Your cover image")
                     st.success("✅ Cover image ready")
+                else:
+                    st.session_state.get("_img_cache", {}).pop("publisher_cover", None)
+            
+            session_ids = set()
+            total_images = total_words = 0
+            for story in stories_for_export:
+                session_ids.add(story['session_id'])
+                total_images += len(story['images'])
+                total_words += story['word_count']
+            total_sessions = len(session_ids)
             
             st.markdown("---")
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Total Stories", len(stories_for_export))
             with col2:
-                total_sessions = len(set(s['session_id'] for s in stories_for_export))
                 st.metric("Sessions", total_sessions)
             with col3:
-                total_images = sum(len(s.get('images', [])) for s in stories_for_export)
                 st.metric("Images", total_images)
             with col4:
-                total_words = sum(len(s.get('answer_text', '').split()) for s in stories_for_export)
                 st.metric("Words", f"{total_words:,}")
             
             with st.expander("📖 Preview First 3 Stories", expanded=False):
@@ -5207,7 +5512,7 @@ if st.session_state.get('show_publisher', False):
                     else:
                         st.markdown(f"**{story.get('session_title', 'Session')}**")
                     
-                    preview_text = clean_text_for_export(story.get('answer_text', ''))[:300]
+                    preview_text = html_preview(story.get('answer_text', ''), 300)
                     st.markdown(f"{preview_text}...")
                     
                     if story.get('images'):
@@ -5218,145 +5523,39 @@ if st.session_state.get('show_publisher', False):
             st.markdown("---")
             st.markdown("### 🖨️ Generate Your Book")
             
-            col1, col2, col3, col4 = st.columns(4)
+            now = datetime.now()
+            file_stem = f"{book_title.translate(_FILENAME_TRANS)}_{now.strftime('%Y%m%d')}"
             
-            with col1:
-                if st.button("📊 DOCX", key="generate_docx_btn", type="primary", use_container_width=True):
-                    with st.spinner("Creating Word document..."):
-                        cover_image_data = uploaded_cover.getvalue() if uploaded_cover else None
-                        
-                        docx_bytes = generate_docx_book(
-                            book_title,
-                            book_author,
-                            stories_for_export,
-                            format_style,
-                            include_toc,
-                            True,
-                            cover_image_data,
-                            cover_choice
-                        )
-                        
-                        if docx_bytes:
-                            filename = f"{book_title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-                            
-                            st.download_button(
-                                "📥 Download DOCX", 
-                                data=docx_bytes, 
-                                file_name=filename, 
-                                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-                                use_container_width=True,
-                                key="docx_download_btn"
-                            )
-                            show_celebration()
-            
-            with col2:
-                if st.button("🌐 HTML", key="generate_html_btn", type="primary", use_container_width=True):
-                    with st.spinner("Creating HTML page..."):
-                        cover_image_data = uploaded_cover.getvalue() if uploaded_cover else None
-                        
-                        html_content = generate_html_book(
-                            book_title,
-                            book_author,
-                            stories_for_export,
-                            format_style,
-                            include_toc,
-                            True,
-                            cover_image_data,
-                            cover_choice
-                        )
-                        
-                        if html_content:
-                            filename = f"{book_title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.html"
-                            
-                            st.download_button(
-                                "📥 Download HTML", 
-                                data=html_content, 
-                                file_name=filename, 
-                                mime="text/html", 
-                                use_container_width=True,
-                                key="html_download_btn"
-                            )
-                            show_celebration()
-            
-            with col3:
-                if st.button("📱 EPUB", key="generate_epub_btn", type="primary", use_container_width=True):
-                    with st.spinner("Creating EPUB file..."):
-                        cover_image_data = uploaded_cover.getvalue() if uploaded_cover else None
-                        
-                        epub_bytes, error = generate_epub_book(
-                            book_title,
-                            book_author,
-                            stories_for_export,
-                            format_style,
-                            include_toc,
-                            True,
-                            cover_image_data,
-                            cover_choice
-                        )
-                        
-                        if epub_bytes:
-                            filename = f"{book_title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.epub"
-                            st.download_button(
-                                "📥 Download EPUB", 
-                                data=epub_bytes, 
-                                file_name=filename, 
-                                mime="application/epub+zip", 
-                                use_container_width=True,
-                                key="epub_download_btn"
-                            )
-                            show_celebration()
-                        else:
-                            st.error(f"Failed to generate EPUB: {error}")
-                            st.info("💡 Install ebooklib: pip install ebooklib")
-            
-            with col4:
-                if st.button("📝 RTF", key="generate_rtf_btn", type="primary", use_container_width=True):
-                    with st.spinner("Creating RTF file..."):
-                        cover_image_data = uploaded_cover.getvalue() if uploaded_cover else None
-                        
-                        rtf_bytes = generate_rtf_book(
-                            book_title,
-                            book_author,
-                            stories_for_export,
-                            format_style,
-                            include_toc,
-                            True,
-                            cover_image_data,
-                            cover_choice
-                        )
-                        
-                        if rtf_bytes:
-                            filename = f"{book_title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.rtf"
-                            st.download_button(
-                                "📥 Download RTF", 
-                                data=rtf_bytes, 
-                                file_name=filename, 
-                                mime="application/rtf", 
-                                use_container_width=True,
-                                key="rtf_download_btn"
-                            )
-                            show_celebration()
-                        else:
-                            st.error("Failed to generate RTF")
+            cover_image_data = uploaded_cover.getvalue() if uploaded_cover else None
+            render_book_downloads(book_title, book_author, stories_for_export, format_style,
+                                  include_toc, cover_image_data, cover_choice, file_stem)
             
             with st.expander("📦 JSON Backup", expanded=False):
-                complete_data = {
-                    "user": st.session_state.user_id,
-                    "user_profile": st.session_state.user_account.get('profile', {}),
-                    "book_title": book_title,
-                    "book_author": book_author,
-                    "stories": stories_for_export,
-                    "export_date": datetime.now().isoformat(),
-                    "summary": {
-                        "total_stories": len(stories_for_export),
-                        "total_sessions": total_sessions,
-                        "total_words": total_words
+                user_profile = st.session_state.user_account.get('profile', {})
+                json_key = (st.session_state._export_fp, book_title, book_author,
+                            json.dumps(user_profile, sort_keys=True, default=str))
+                cached_json = st.session_state.get("_publisher_json")
+                if cached_json and cached_json[0] == json_key:
+                    json_bytes = cached_json[1]
+                else:
+                    complete_data = {
+                        "user": st.session_state.user_id,
+                        "user_profile": user_profile,
+                        "book_title": book_title,
+                        "book_author": book_author,
+                        "stories": stories_for_export,
+                        "export_date": now.isoformat(),
+                        "summary": {
+                            "total_stories": len(stories_for_export),
+                            "total_sessions": total_sessions,
+                            "total_words": total_words
+                        }
                     }
-                }
-                json_data = json.dumps(complete_data, indent=2)
+                    json_bytes = json.dumps(complete_data, indent=2).encode('utf-8')
+                    st.session_state._publisher_json = (json_key, json_bytes)
                 st.download_button(
                     label="📥 Download JSON Backup", 
-                    data=json_data,
+                    data=json_bytes,
                     file_name=f"Tell_My_Story_Backup_{st.session_state.user_id}.json",
                     mime="application/json", 
                     use_container_width=True,
@@ -5475,26 +5674,22 @@ else:
         current_question_text = st.session_state.current_question_override
         question_source = "custom"
 
+# Words per session, counted once for both the chapter header and the statistics footer
+SESSION_WORDS = {s["id"]: calculate_author_word_count(s["id"]) for s in SESSIONS if SESSION_COUNTS[s["id"]][0]}
+
 st.markdown("---")
 
 col1, col2 = st.columns([3, 1])
 with col1:
     st.subheader(f"Session {current_session_id}: {current_session['title']}")
     if len(current_session.get("questions", [])) > 0:
-        sdata = st.session_state.responses.get(current_session_id, {})
-        answered = len(sdata.get("questions", {}))
+        answered = SESSION_COUNTS[current_session_id][0]
         total = len(current_session["questions"])
         if total > 0: 
             st.progress(answered/total)
             st.caption(f"📝 Topics explored: {answered}/{total} ({answered/total*100:.0f}%)")
     else:
-        sdata = st.session_state.responses.get(current_session_id, {})
-        total_words = 0
-        for q_data in sdata.get("questions", {}).values():
-            if q_data.get("answer"):
-                text_only = re.sub(r'<[^>]+>', '', q_data["answer"])
-                total_words += len(re.findall(r'\w+', text_only))
-        st.caption(f"📝 Total words written in this chapter: {total_words}")
+        st.caption(f"📝 Total words written in this chapter: {SESSION_WORDS.get(current_session_id, 0)}")
         
 with col2:
     if question_source == "custom":
@@ -5504,7 +5699,7 @@ with col2:
     else:
         st.markdown(f'<div class="topic-counter">Topic {st.session_state.current_question+1} of {len(current_session["questions"])}</div>', unsafe_allow_html=True)
 
-st.markdown(f'<div class="question-box">{current_question_text}</div>', unsafe_allow_html=True)
+st.markdown(f'<div class="question-box">{html.escape(current_question_text)}</div>', unsafe_allow_html=True)
 
 if question_source == "regular":
     st.markdown(f'<div class="chapter-guidance">{current_session.get("guidance", "")}</div>', unsafe_allow_html=True)
@@ -5524,9 +5719,8 @@ if current_session_id in st.session_state.responses:
     if current_question_text in st.session_state.responses[current_session_id]["questions"]:
         existing_answer = st.session_state.responses[current_session_id]["questions"][current_question_text]["answer"]
 
-if st.session_state.logged_in:
-    init_image_handler()
-    existing_images = st.session_state.image_handler.get_images_for_answer(current_session_id, current_question_text) if st.session_state.image_handler else []
+image_handler = init_image_handler() if st.session_state.logged_in else None
+existing_images = image_handler.get_images_for_answer(current_session_id, current_question_text) if image_handler else []
 
 # ============================================================================
 # QUILL EDITOR
@@ -5620,7 +5814,7 @@ show_import = st.session_state[import_key]
 with col1:
     if st.button("💾 Save", key=f"save_btn_{editor_base_key}", type="primary", use_container_width=True):
         current_content = st.session_state[content_key]
-        if current_content and current_content.strip() and current_content != "<p><br></p>" and current_content != "<p>Start writing your story here...</p>":
+        if current_content and not current_content.isspace() and current_content != "<p><br></p>" and current_content != "<p>Start writing your story here...</p>":
             with st.spinner("Saving your story..."):
                 if save_response(current_session_id, current_question_text, current_content):
                     st.success("✅ Saved!")
@@ -5888,7 +6082,7 @@ st.markdown("---")
 # ============================================================================
 # IMAGE UPLOAD SECTION
 # ============================================================================
-if st.session_state.logged_in and st.session_state.image_handler:
+if image_handler:
     
     if existing_images:
         st.markdown("### 📸 Your Uploaded Photos")
@@ -5898,7 +6092,7 @@ if st.session_state.logged_in and st.session_state.image_handler:
             col1, col2, col3 = st.columns([2, 3, 1])
             
             with col1:
-                st.markdown(img.get("thumb_html", ""), unsafe_allow_html=True)
+                st.image(img["thumb_path"])
             
             with col2:
                 caption_text = img.get("caption", "")
@@ -5909,7 +6103,7 @@ if st.session_state.logged_in and st.session_state.image_handler:
             
             with col3:
                 if st.button(f"🗑️", key=f"del_img_{img['id']}_{idx}"):
-                    st.session_state.image_handler.delete_image(img['id'])
+                    image_handler.delete_image(img['id'])
                     st.rerun()
         
         st.markdown("---")
@@ -5917,41 +6111,49 @@ if st.session_state.logged_in and st.session_state.image_handler:
     with st.expander("📤 Upload New Photos", expanded=len(existing_images) == 0):
         st.markdown("**Add new photos to your story:**")
         
-        uploaded_file = st.file_uploader(
-            "Choose an image...", 
-            type=['jpg', 'jpeg', 'png'], 
-            key=f"up_{current_session_id}_{hash(current_question_text)}",
-            label_visibility="collapsed"
-        )
-        
-        if uploaded_file:
+        # Batch file, caption and size into one form so typing a caption
+        # does not rerun the whole page on every keystroke.
+        upload_key = f"{current_session_id}_{hash(current_question_text)}"
+        with st.form(f"upload_form_{upload_key}", clear_on_submit=True):
+            uploaded_file = st.file_uploader(
+                "Choose an image...", 
+                type=['jpg', 'jpeg', 'png'], 
+                key=f"up_{upload_key}",
+                label_visibility="collapsed"
+            )
+            
             col1, col2 = st.columns([3, 1])
             with col1:
                 caption = st.text_input(
                     "Caption / Description:",
                     placeholder="What does this photo show? When was it taken?",
-                    key=f"cap_{current_session_id}_{hash(current_question_text)}"
+                    key=f"cap_{upload_key}"
                 )
                 usage = st.radio(
                     "Image size:",
                     ["Full Page", "Inline"],
                     horizontal=True,
-                    key=f"usage_{current_session_id}_{hash(current_question_text)}",
+                    key=f"usage_{upload_key}",
                     help="Full Page: 1600px wide, Inline: 800px wide"
                 )
             with col2:
-                if st.button("📤 Upload", key=f"btn_{current_session_id}_{hash(current_question_text)}", type="primary", use_container_width=True):
-                    with st.spinner("Uploading and optimizing..."):
-                        usage_type = "full_page" if usage == "Full Page" else "inline"
-                        result = st.session_state.image_handler.save_image(
-                            uploaded_file, current_session_id, current_question_text, caption, usage_type
-                        )
-                        if result:
-                            st.success("✅ Photo uploaded and optimized!")
-                            time.sleep(1.5)
-                            st.rerun()
-                        else:
-                            st.error("Upload failed")
+                submitted = st.form_submit_button("📤 Upload", type="primary", use_container_width=True)
+        
+        if submitted:
+            if not uploaded_file:
+                st.warning("Please choose an image first.")
+            else:
+                with st.spinner("Uploading and optimizing..."):
+                    usage_type = "full_page" if usage == "Full Page" else "inline"
+                    result = image_handler.save_image(
+                        uploaded_file, current_session_id, current_question_text, caption, usage_type
+                    )
+                    if result:
+                        st.success("✅ Photo uploaded and optimized!")
+                        time.sleep(1.5)
+                        st.rerun()
+                    else:
+                        st.error("Upload failed")
     
     st.markdown("---")
 
@@ -5973,9 +6175,8 @@ st.subheader("🦋 Beta Reader Feedback")
 tab1, tab2 = st.tabs(["📝 Current Session", "📚 Feedback History"])
 
 with tab1:
-    sdata = st.session_state.responses.get(current_session_id, {})
-    answered_cnt = len(sdata.get("questions", {}))
-    total_q = len(current_session["questions"])
+    sdata = st.session_state.responses[current_session_id]
+    answered_cnt, total_q = SESSION_COUNTS[current_session_id]
 
     st.markdown(f"**Progress:** {answered_cnt}/{total_q} topics answered")
     
@@ -5992,12 +6193,12 @@ with tab1:
         if st.button("🦋 Get Beta Read", key=f"beta_btn_{beta_key}", use_container_width=True, type="primary"):
             with st.spinner("Beta Reader is analyzing your stories with full profile context..."):
                 if beta_reader:
-                    session_text = ""
-                    for q, a in sdata.get("questions", {}).items():
-                        text_only = re.sub(r'<[^>]+>', '', a.get("answer", ""))
-                        session_text += f"Question: {q}\nAnswer: {text_only}\n\n"
+                    session_text = "".join(
+                        f"Question: {q}\nAnswer: {TAG_RE.sub('', a.get('answer', ''))}\n\n"
+                        for q, a in sdata["questions"].items()
+                    )
                     
-                    if session_text.strip():
+                    if session_text and not session_text.isspace():
                         fb = generate_beta_reader_feedback(current_session["title"], session_text, fb_type)
                         if "error" not in fb: 
                             st.session_state.beta_feedback_display = fb
@@ -6024,25 +6225,23 @@ with tab2:
     if not all_feedback:
         st.info("No saved feedback yet. Generate feedback from any session and click 'Save This Feedback to History' to keep it forever.")
     else:
+        titles_by_id = {str(s["id"]): s["title"] for s in SESSIONS}
+        now_iso = datetime.now().isoformat()
         all_entries = []
         for session_id_str, feedback_list in all_feedback.items():
-            session_title = "Unknown Session"
-            for s in SESSIONS:
-                if str(s["id"]) == session_id_str:
-                    session_title = s["title"]
-                    break
+            session_title = titles_by_id.get(session_id_str, "Unknown Session")
             
             for fb in feedback_list:
                 all_entries.append({
                     "session_id": session_id_str, "session_title": session_title,
-                    "date": fb.get('generated_at', datetime.now().isoformat()), "feedback": fb
+                    "date": fb.get('generated_at', now_iso), "feedback": fb
                 })
         
-        all_entries.sort(key=lambda x: x['date'], reverse=True)
+        all_entries.sort(key=itemgetter('date'), reverse=True)
         
         for i, entry in enumerate(all_entries):
             fb = entry['feedback']
-            fb_date = datetime.fromisoformat(entry['date']).strftime('%B %d, %Y at %I:%M %p')
+            fb_date = format_feedback_date(entry['date'])
             
             with st.expander(f"📖 {entry['session_title']} - {fb_date} ({fb.get('feedback_type', 'comprehensive').title()})"):
                 col1, col2, col3 = st.columns([2, 2, 1])
@@ -6099,25 +6298,27 @@ st.markdown("### 📊 Your Writing Statistics")
 st.markdown("<br>", unsafe_allow_html=True)
 # =============================================
 
+total_words = sum(SESSION_WORDS.values())
+completed_sessions = total_topics = 0
+for answered, total in SESSION_COUNTS.values():
+    total_topics += total
+    if answered == total:
+        completed_sessions += 1
+
 col1, col2, col3, col4 = st.columns(4)
 with col1: 
-    st.metric("Total Words", sum(calculate_author_word_count(s["id"]) for s in SESSIONS))
+    st.metric("Total Words", total_words)
 with col2: 
-    unique_q = set()
-    for s in SESSIONS:
-        for q, _ in st.session_state.responses.get(s["id"], {}).get("questions", {}).items():
-            unique_q.add((s["id"], q))
-    comp = sum(1 for s in SESSIONS if len([x for (sid,x) in unique_q if sid == s["id"]]) == len(s["questions"]))
-    st.metric("Completed Sessions", f"{comp}/{len(SESSIONS)}")
+    st.metric("Completed Sessions", f"{completed_sessions}/{len(SESSIONS)}")
 with col3: 
-    st.metric("Topics Explored", f"{len(unique_q)}/{sum(len(s['questions']) for s in SESSIONS)}")
+    st.metric("Topics Explored", f"{TOTAL_ANSWERS}/{total_topics}")
 with col4: 
-    st.metric("Total Answers", sum(len(st.session_state.responses.get(s["id"], {}).get("questions", {})) for s in SESSIONS))
+    st.metric("Total Answers", TOTAL_ANSWERS)
 
 st.markdown("---")
 if st.session_state.user_account:
     profile = st.session_state.user_account['profile']
     age = (datetime.now() - datetime.fromisoformat(st.session_state.user_account['created_at'])).days
-    st.caption(f"Tell My Story Timeline • 👤 {profile['first_name']} {profile['last_name']} • 📅 Account Age: {age} days • 📚 Bank: {st.session_state.get('current_bank_name', 'None')}")
+    st.caption(f"Tell My Story Timeline • 👤 {profile_display_name(profile)} • 📅 Account Age: {age} days • 📚 Bank: {st.session_state.get('current_bank_name', 'None')}")
 else: 
     st.caption(f"Tell My Story Timeline • User: {st.session_state.user_id}")
@@ -0,0 +1,21 @@
+# file_utils.py - crash-safe file writes shared by the app, vignettes and beta reader
+import os
+import uuid
+from pathlib import Path
+
+
+def write_file_atomic(path, data):
+    """Write text or bytes to a sibling temp file and os.replace() it over path.
+
+    Readers always see either the old or the new complete file, never a
+    truncated one, and no fsync is paid per write.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
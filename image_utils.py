@@ -0,0 +1,101 @@
+# image_utils.py - JPEG encoding, user image folders and the image metadata index shared by every session's ImageHandler
+import io
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# libjpeg releases the GIL while encoding, as does file I/O, so the page image
+# and thumbnail of an upload are encoded and written side by side. Created here, once per process, rather
+# than in biographer.py, which would start a new pool on every rerun
+ENCODE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="jpeg-encode")
+
+
+def encode_jpeg(image, quality, progressive=False):
+    """Encode a PIL image as optimised (and optionally progressive) JPEG bytes."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=progressive)
+    return buffer.getvalue()
+
+
+def save_jpeg(image, path, quality, progressive=False):
+    """Encode image as JPEG and write it to path; returns the encoded size in bytes."""
+    data = encode_jpeg(image, quality, progressive)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+@lru_cache(maxsize=1024)
+def user_image_dir(base_path, user_id):
+    """Create a user's image and thumbnail folders once per process and return the image folder."""
+    user_hash = hashlib.md5(user_id.encode()).hexdigest()[:8]
+    path = base_path / f"user_{user_hash}"
+    (path / "thumbnails").mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# metadata dir -> (frozenset of record file names, {file name: parsed record}, {answer key: [records]}).
+# biographer.py is re-executed on every rerun, so the index lives here, where it
+# is built once per process and shared by every session reading uploads/metadata
+_IMAGE_METADATA_CACHE = {}
+
+
+def load_image_metadata(metadata_dir, load_json_file):
+    """Per-image metadata records in metadata_dir, grouped by (user_id, session_id, question).
+
+    Each group is sorted newest first. Records are only ever created or
+    deleted, never rewritten in place, so the folder's list of record names
+    is the cache key: every call lists the folder, and the index is rebuilt
+    only when that list differs. (The directory mtime alone is not enough;
+    it advances on a coarse clock tick, so an upload right after a scan can
+    leave it unchanged.) On a rebuild only newly added files are parsed with
+    `load_json_file`, and only the answer groups that gained or lost a record
+    are rebuilt. Groups are replaced rather than edited in place, since other
+    sessions may be reading the previous index.
+    """
+    try:
+        with os.scandir(metadata_dir) as entries:
+            names = frozenset(entry.name for entry in entries if entry.name.endswith(".json"))
+    except FileNotFoundError:
+        return {}
+    key = str(metadata_dir)
+    cached = _IMAGE_METADATA_CACHE.get(key)
+    if cached and cached[0] == names:
+        return cached[2]
+
+    known_names, known, by_answer = cached if cached else (frozenset(), {}, {})
+    by_name = {name: known[name] for name in names & known_names if name in known}
+    changed = {}  # answer key -> (records removed, records added)
+    for name in known_names - names:
+        meta = known.get(name)
+        if meta is not None:
+            changed.setdefault(_answer_key(meta), ([], []))[0].append(meta)
+    for name in names - known_names:
+        path = os.path.join(metadata_dir, name)
+        try:
+            meta = by_name[name] = load_json_file(path)
+        except Exception as e:
+            logger.error(f"Error reading metadata {path}: {e}")
+            continue
+        changed.setdefault(_answer_key(meta), ([], []))[1].append(meta)
+
+    by_answer = dict(by_answer)
+    for answer_key, (removed, added) in changed.items():
+        removed_ids = set(map(id, removed))
+        group = [meta for meta in by_answer.get(answer_key, ()) if id(meta) not in removed_ids] + added
+        if group:
+            group.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+            by_answer[answer_key] = group
+        else:
+            by_answer.pop(answer_key, None)
+    _IMAGE_METADATA_CACHE[key] = (names, by_name, by_answer)
+    return by_answer
+
+
+def _answer_key(meta):
+    return (meta.get("user_id"), meta.get("session_id"), meta.get("question"))
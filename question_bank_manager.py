@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 import uuid
 import logging
+from operator import itemgetter
 from pathlib import Path
 
 # Set up logging
@@ -69,7 +70,7 @@ class QuestionBankManager:
                     continue
             
             logger.info(f"Loaded {len(sessions)} sessions from {csv_path}")
-            return sorted(sessions, key=lambda x: x['id'])
+            return sorted(sessions, key=itemgetter('id'))
             
         except Exception as e:
             logger.error(f"Error loading CSV {csv_path}: {e}")
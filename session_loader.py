@@ -1,6 +1,7 @@
 # session_loader.py
 import pandas as pd
 import os
+from operator import itemgetter
 import streamlit as st
 
 DEFAULT_WORD_TARGET = 500
@@ -60,7 +61,7 @@ class SessionLoader:
                     if pd.notna(first_target):
                         try:
                             word_target = int(float(first_target))
-                        except:
+                        except (TypeError, ValueError):
                             word_target = DEFAULT_WORD_TARGET
                 
                 questions = []
@@ -79,7 +80,7 @@ class SessionLoader:
                     }
             
             sessions_list = list(sessions_dict.values())
-            sessions_list.sort(key=lambda x: x['id'])
+            sessions_list.sort(key=itemgetter('id'))
             
             if not sessions_list:
                 st.warning("⚠️ No sessions found in CSV file")
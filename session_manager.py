@@ -4,6 +4,7 @@ import json
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import os
+from operator import itemgetter
 import pandas as pd
 
 class SessionManager:
@@ -53,7 +54,7 @@ class SessionManager:
                         if pd.notna(first_target):
                             try:
                                 word_target = int(float(first_target))
-                            except:
+                            except (TypeError, ValueError):
                                 word_target = 500
                     
                     # Get all questions
@@ -75,7 +76,7 @@ class SessionManager:
                 
                 # Convert to list and sort by session_id
                 sessions_list = list(sessions_dict.values())
-                sessions_list.sort(key=lambda x: x['id'])
+                sessions_list.sort(key=itemgetter('id'))
                 
                 self.sessions = sessions_list
             else:
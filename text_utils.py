@@ -0,0 +1,91 @@
+# text_utils.py - word counts and tag-stripped text shared by the app and the vignette manager
+import re
+import logging
+from datetime import datetime
+from functools import lru_cache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\S+')
+_WORD_TOKEN_RE = re.compile(r'\w+')
+_TEXT_OR_TAG_RE = re.compile(r'<[^>]+>|[^<]+|<')
+
+_ENTITIES = {'&nbsp;': ' ', '&amp;': '&', '&lt;': '<', '&gt;': '>', '&quot;': '"', '&#39;': "'"}
+_ENTITY_RE = re.compile('|'.join(map(re.escape, _ENTITIES)))
+
+
+def count_words(text):
+    """Count whitespace-separated words without materialising the token list."""
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+
+def count_word_tokens(text):
+    """Count \\w+ word tokens (the measure used for streaks and word targets) without a findall list."""
+    return sum(1 for _ in _WORD_TOKEN_RE.finditer(text))
+
+
+def count_html_words(html):
+    """Whitespace-separated words in `html` once tags are stripped."""
+    return count_words(TAG_RE.sub('', html or ""))
+
+
+@lru_cache(maxsize=512)
+def format_feedback_date(iso_timestamp):
+    """Human-readable feedback timestamp.
+
+    Memoised here rather than in biographer.py, which Streamlit re-executes on
+    every rerun; an imported module keeps the cache for the life of the process.
+    """
+    return datetime.fromisoformat(iso_timestamp).strftime('%B %d, %Y at %I:%M %p')
+
+
+def _decode_entities(text):
+    return _ENTITY_RE.sub(lambda m: _ENTITIES[m.group()], text)
+
+
+def clean_text_for_export(text):
+    """Clean text for export - remove HTML tags but preserve structure"""
+    if not text:
+        return ""
+
+    try:
+        text = _decode_entities(text)
+        text = TAG_RE.sub('', text)
+
+        return text.strip()
+    except Exception as e:
+        logger.error(f"Error cleaning text for export: {e}")
+        return ""
+
+
+def html_preview(text, limit):
+    """Return clean_text_for_export(text)[:limit] without cleaning the whole text.
+
+    Text runs are entity-decoded as they are collected, and scanning stops
+    once the decoded text reaches `limit`. The collected prefix (always cut at
+    a tag or text-run boundary) is then cleaned with clean_text_for_export()
+    itself. That result is only trusted when nothing later in the text can
+    change the preview window: no unmatched '<' inside it (it could pair with
+    a '>' further on), and a non-space character after it that no such '<'
+    precedes (so the final strip() cannot eat into the window). Otherwise
+    scanning resumes with a doubled target.
+    """
+    text = text or ""
+    collected = 0
+    decoded_length = 0
+    target = limit
+    for match in _TEXT_OR_TAG_RE.finditer(text):
+        piece = match.group()
+        collected = match.end()
+        if piece[0] == '<' and len(piece) > 1:
+            continue
+        decoded_length += len(_decode_entities(piece))
+        if decoded_length >= target:
+            cleaned = clean_text_for_export(text[:collected])
+            window, tail = cleaned[:limit], cleaned[limit:]
+            if len(window) == limit and '<' not in window and not tail.partition('<')[0].isspace() and tail[:1] != '<':
+                return window
+            target *= 2
+    return clean_text_for_export(text)[:limit]
@@ -8,10 +8,50 @@ import re
 import base64
 import hashlib
 import time
+import io
 import openai
+from PIL import Image
 
 from streamlit_quill import st_quill
 
+from file_utils import write_file_atomic
+from text_utils import count_html_words, html_preview
+
+
+def _content_preview(content, limit=100):
+    """Cleaned opening of `content`, with "..." when it runs past `limit` characters."""
+    preview = html_preview(content, limit + 1)
+    return preview[:limit] + "..." if len(preview) > limit else preview
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _image_thumbnail(image_key, _path, _b64, max_size=400):
+    """Downscale a vignette image once per image id, from the saved file or its base64 copy.
+
+    Unreadable images raise instead of returning None, so a failure is never
+    cached and the next rerun tries again.
+    """
+    if _path and os.path.exists(_path):
+        img = Image.open(_path)
+    else:
+        img = Image.open(io.BytesIO(base64.b64decode(_b64)))
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def _thumbnail_or_none(image_key, path, b64):
+    """Cached thumbnail bytes for a vignette image, or None if it cannot be read."""
+    if not (path or b64):
+        return None
+    try:
+        return _image_thumbnail(image_key, path, b64)
+    except Exception:
+        return None
+
 class VignetteManager:
     def __init__(self, user_id):
         self.user_id = user_id
@@ -33,12 +73,11 @@ class VignetteManager:
                     self.vignettes = json.load(f)
             else:
                 self.vignettes = []
-        except:
+        except (OSError, ValueError):
             self.vignettes = []
     
     def _save(self):
-        with open(self.file, 'w') as f:
-            json.dump(self.vignettes, f, indent=2)
+        write_file_atomic(self.file, json.dumps(self.vignettes, separators=(",", ":")))
     
     def save_vignette_image(self, uploaded_file, vignette_id):
         try:
@@ -71,7 +110,7 @@ class VignetteManager:
             "content": content,
             "theme": theme,
             "mood": mood,
-            "word_count": len(re.sub(r'<[^>]+>', '', content).split()),
+            "word_count": count_html_words(content),
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
             "is_draft": is_draft,
@@ -90,7 +129,7 @@ class VignetteManager:
             "content": content,
             "theme": theme,
             "mood": mood,
-            "word_count": len(re.sub(r'<[^>]+>', '', content).split()),
+            "word_count": count_html_words(content),
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
             "is_draft": is_draft,
@@ -109,7 +148,7 @@ class VignetteManager:
                     "content": content, 
                     "theme": theme, 
                     "mood": mood or v.get("mood", "Reflective"),
-                    "word_count": len(re.sub(r'<[^>]+>', '', content).split()), 
+                    "word_count": count_html_words(content), 
                     "updated_at": datetime.now().isoformat(),
                     "images": images or v.get("images", [])
                 })
@@ -214,7 +253,7 @@ class VignetteManager:
                     from docx import Document
                     docx_bytes = io.BytesIO(uploaded_file.getvalue())
                     doc = Document(docx_bytes)
-                    paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+                    paragraphs = [text for para in doc.paragraphs if (text := para.text) and not text.isspace()]
                     file_content = '\n\n'.join(paragraphs)
                 except ImportError:
                     st.error("Please install: pip install python-docx")
@@ -231,8 +270,8 @@ class VignetteManager:
             
             elif file_extension in ['vtt', 'srt']:
                 file_content = uploaded_file.read().decode('utf-8', errors='ignore')
-                lines = file_content.split('\n')
-                clean_lines = [line.strip() for line in lines if '-->' not in line and not line.strip().isdigit() and line.strip()]
+                clean_lines = [stripped for line in file_content.splitlines()
+                               if (stripped := line.strip()) and '-->' not in stripped and not stripped.isdigit()]
                 file_content = ' '.join(clean_lines)
             
             elif file_extension == 'json':
@@ -257,7 +296,7 @@ class VignetteManager:
                 st.info("Supported: .txt, .docx, .rtf, .vtt, .srt, .json, .md")
                 return None
             
-            if not file_content or not file_content.strip():
+            if not file_content or file_content.isspace():
                 st.warning("File is empty")
                 return None
             
@@ -268,8 +307,8 @@ class VignetteManager:
             current_para = []
             
             for sentence in sentences:
-                if sentence.strip():
-                    current_para.append(sentence.strip() + '.')
+                if stripped := sentence.strip():
+                    current_para.append(stripped + '.')
                     if len(current_para) >= 4:
                         paragraphs.append(' '.join(current_para))
                         current_para = []
@@ -280,13 +319,10 @@ class VignetteManager:
             if not paragraphs:
                 paragraphs = [file_content]
             
-            html_content = ''
-            for para in paragraphs:
-                if para.strip():
-                    para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                    html_content += f'<p>{para.strip()}</p>'
-            
-            return html_content
+            return ''.join(
+                f"<p>{para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')}</p>"
+                for line in paragraphs if (para := line.strip())
+            )
             
         except Exception as e:
             st.error(f"Import error: {str(e)}")
@@ -498,11 +534,7 @@ class VignetteManager:
                                     f"{base_key}_ai_result", f"{base_key}_show_ai_menu", 
                                     f"{base_key}_show_preview"]
                     for key in keys_to_clear:
-                        if key in st.session_state:
-                            try:
-                                del st.session_state[key]
-                            except:
-                                pass
+                        st.session_state.pop(key, None)
                     st.session_state.show_vignette_modal = False
                     st.session_state.editing_vignette_id = None
                     st.rerun()
@@ -672,10 +704,7 @@ class VignetteManager:
                     st.markdown(f"### {status_emoji} {v['title']}  `{status_text}`")
                     st.markdown(f"*{v['theme']}*")
                     
-                    content_preview = re.sub(r'<[^>]+>', '', v['content'])
-                    if len(content_preview) > 100:
-                        content_preview = content_preview[:100] + "..."
-                    st.markdown(content_preview)
+                    st.markdown(_content_preview(v['content']))
                     
                     date_str = datetime.fromisoformat(v.get('updated_at', v.get('created_at', ''))).strftime('%b %d, %Y')
                     st.caption(f"📝 {v['word_count']} words • Last updated: {date_str}")
@@ -731,18 +760,21 @@ class VignetteManager:
         st.markdown("---")
         st.markdown(v['content'], unsafe_allow_html=True)
         
-        if v.get('images'):
+        if images := v.get('images'):
             st.markdown("---")
             st.markdown("### 📸 Images")
             cols = st.columns(3)
-            for i, img in enumerate(v['images']):
+            for i, img in enumerate(images):
                 with cols[i % 3]:
-                    if img.get('base64'):
-                        st.image(f"data:image/jpeg;base64,{img['base64']}", use_column_width=True)
-                    elif img.get('path') and os.path.exists(img['path']):
-                        st.image(img['path'], use_column_width=True)
-                    if img.get('caption'):
-                        st.caption(img['caption'])
+                    path = img.get('path')
+                    b64 = img.get('base64')
+                    thumb = _thumbnail_or_none(img.get('id') or path or hash(b64), path, b64)
+                    if thumb:
+                        st.image(thumb, use_column_width=True)
+                    elif path and os.path.exists(path):
+                        st.image(path, use_column_width=True)
+                    if caption := img.get('caption'):
+                        st.caption(caption)
         
         st.markdown("---")
         